@@ -4,6 +4,27 @@ FPS = 60
 ENABLED_FPS_DISPLAY = False
 AGENT_MAX_SEARCH_SECS = 10
 AGENT_SEC_THRESHOLD = -0.02
+AGENT_TIME_MARGIN_SECS = 0.25
+AGENT_TIME_TARGET_RATIO = 0.5
+AGENT_TIME_EXTENSION_RATIO = 1.5
+AGENT_STABLE_ITERATIONS = 4
+AGENT_SCORE_DROP_MARGIN = 10
+AGENT_TABLE_SIZE_MB = 32
+AGENT_NUM_HELPERS = 0
+ENABLED_PONDERING = True
+AGENT_MAX_PONDER_DEPTH = 10
+AGENT_OPENING_BOOK = "books/opening.book"
+AGENT_STATS_PATH = None
+AGENT_QUIESCENCE_DEPTH = 4
+AGENT_QUIESCENCE_DELTA_MARGIN = 10
+AGENT_NULL_MOVE_MIN_MARBLES = 10
+AGENT_LATE_MOVE_MIN_MOVES = 4
+AGENT_ASPIRATION_WINDOWS = (5, 20, 80)
+ENABLED_NULL_MOVE_PRUNING = True
+ENABLED_LATE_MOVE_REDUCTIONS = True
+ENABLED_DELTA_PRUNING = True
+ENABLED_HASH_VERIFICATION = False
+ENABLED_PROFILING = False
 
 # rules
 BOARD_SIZE = 5
@@ -1,202 +1,663 @@
+import os
+import sys
 from math import inf
 from copy import deepcopy
+from dataclasses import replace
 from time import time
-from helpers.format_secs import format_secs
-from core.agent.heuristic import heuristic
-from core.agent.state_generator import enumerate_player_moves
+from threading import Thread
+from multiprocessing import get_context
+from core.agent.heuristic import heuristic, IncrementalHeuristic, WEIGHT_SCORE, WEIGHT_SCORE_OPPONENT, MAX_MARBLES
+from core.agent.state_generator import StagedMoveGenerator, generate_moves, generate_sumitos, is_packed_move_legal
 from core.agent.transposition_table import TranspositionTable
-from core.hex import Hex
+from core.agent.move_ordering import MoveOrdering
+from core.agent.opening_book import OpeningBook
+from core.agent.search_stats import SearchStats
+from core.cells import CELL_NEIGHBORS
 from core.board_cell_state import BoardCellState
-from core.board_hasher import hash_board, update_hash
-from core.game import apply_move
+from core.bitboard import BitBoard
+from core.board_hasher import hash_board, update_hash_from_record, verify_hash, ZOBRIST_TURN
+from core.game import apply_move, undo_move
+from core.packed_move import unpack_move, MOVE_TARGET_CELLS
+from debug.profiler import PROFILING, profiler
+from config import (
+    ENABLED_HASH_VERIFICATION, AGENT_NUM_HELPERS, AGENT_OPENING_BOOK,
+    AGENT_QUIESCENCE_DEPTH, AGENT_QUIESCENCE_DELTA_MARGIN, AGENT_MAX_PONDER_DEPTH,
+    AGENT_NULL_MOVE_MIN_MARBLES, AGENT_LATE_MOVE_MIN_MOVES, AGENT_ASPIRATION_WINDOWS,
+    ENABLED_NULL_MOVE_PRUNING, ENABLED_LATE_MOVE_REDUCTIONS, ENABLED_DELTA_PRUNING,
+    NUM_EJECTED_MARBLES_TO_WIN,
+)
+
+# the most an ejection can change the evaluation by, besides position
+EJECTION_GAIN = max(WEIGHT_SCORE, WEIGHT_SCORE_OPPONENT)
+
+# a side that has lost the game scores -WIN_SCORE plus its distance in plies
+# from the root, so that faster wins and slower losses score higher.
+# Scores beyond WIN_THRESHOLD are decided.
+WIN_SCORE = 100000
+MAX_PLY = 1000
+WIN_THRESHOLD = WIN_SCORE - MAX_PLY
+
+# iterative deepening never goes deeper, which keeps depths within the
+# transposition table's depth field
+MAX_DEPTH = 64
+MIN_MARBLES = MAX_MARBLES - NUM_EJECTED_MARBLES_TO_WIN
 
 
 class TimerInterrupt(Exception):
     pass
 
 
-def _estimate_move_score(board, move):
-    WEIGHT_SUMITO = 10 # consider sumitos first
-    return (len(move.pieces())
-        + WEIGHT_SUMITO * (board[move.target_cell()] != BoardCellState.EMPTY))
-
-
-def _find_main_line(board, move, transposition_table):
-    main_line = [move]
-
-    board = deepcopy(board)
-    apply_move(board, move)
-
-    board_hash = hash_board(board)
-    root = transposition_table[board_hash]
-    node = root
-
-    while node:
-        best_move = node.move
-        if best_move:
-            move_hash = update_hash(board_hash, board, best_move)
-            apply_move(board, best_move)
-            main_line.append((best_move, node.score, node.depth))
-            node = (transposition_table[move_hash]
-                if move_hash in transposition_table
-                else None)
-        else:
-            node = None
+def _score_to_table(score, ply):
+    """
+    Converts a decided score from distance to the root into distance to the
+    current node, so that it stays valid wherever the position recurs.
+    """
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+def _score_from_table(score, ply):
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+def _estimate_move_heuristic(board, move, color):
+    move_record = apply_move(board, move)
+    move_score = heuristic(board, color)
+    undo_move(board, move_record)
+    return move_score
+
+
+def _interrupt_on_event(agent, event):
+    event.wait()
+    agent.interrupt()
+
+def _run_helper(table_name, table_size_mb, helper_index, jobs, results, stop_event):
+    """
+    Entry point of a Lazy SMP helper process.
+    Helpers search every position they are sent until the main search stops,
+    sharing what they find through the transposition table, then report the
+    number of nodes they searched.
+    """
+    # helpers only feed the shared table, so keep their progress out of the log
+    sys.stdout = open(os.devnull, "w")
+    board_cache = TranspositionTable.attach(table_name, table_size_mb)
+    agent = Agent(num_helpers=0, board_cache=board_cache, opening_book_path=None)
+
+    for board, color, generation in iter(jobs.get, None):
+        board_cache.generation = generation
+        agent._interrupted = False
+        Thread(target=_interrupt_on_event, args=(agent, stop_event), daemon=True).start()
+        num_nodes = agent.num_nodes
+        try:
+            for _ in agent._gen_search(board, color, helper_index):
+                pass
+        except TimerInterrupt:
+            pass
+        results.put(agent.num_nodes - num_nodes)
 
-    return main_line
+    board_cache.close()
 
 class Agent:
 
-    def __init__(self):
+    def __init__(self, num_helpers=AGENT_NUM_HELPERS, board_cache=None,
+            null_move_pruning=ENABLED_NULL_MOVE_PRUNING,
+            late_move_reductions=ENABLED_LATE_MOVE_REDUCTIONS,
+            delta_pruning=ENABLED_DELTA_PRUNING,
+            opening_book_path=AGENT_OPENING_BOOK):
         self._interrupted = False
-        self._num_requests = 0
-        self._num_prunes_total = 0
-        self._num_prunes_last = 0
-        self._num_plies_expanded = 0
-        self._num_branches_explored = 0
-        self._num_branches_enumerated = 0
-        self._board_cache = TranspositionTable()
+        self._null_move_pruning = null_move_pruning
+        self._late_move_reductions = late_move_reductions
+        self._delta_pruning = delta_pruning
+        self._num_nodes = 0
+        self._num_quiescence_nodes = 0
+        self._num_cutoffs = 0
+        self._num_first_move_cutoffs = 0
+        self._num_null_move_prunes = 0
+        self._num_late_move_reductions = 0
+        self._num_late_move_researches = 0
+        self._num_terminal_nodes = 0
+        self._num_fail_lows = 0
+        self._num_fail_highs = 0
+        self._num_table_cutoffs = 0
+        self._depth = 0
+        self._iteration_secs = []
+        self._stats = SearchStats()
+        self._num_helpers = num_helpers
+        self._helpers = None
+        self._helper_results = None
+        self._helper_stop = None
+        self._num_helpers_searching = 0
+        self._board_cache = (board_cache
+            if board_cache is not None
+            else TranspositionTable.create_shared() if num_helpers
+            else TranspositionTable())
+        self._move_ordering = MoveOrdering()
+        self._opening_book = (OpeningBook(opening_book_path)
+            if opening_book_path and os.path.exists(opening_book_path)
+            else None)
         self._best_move_gen = None
+        self._evaluator = None
+        self._time_manager = None
+        self._ponder_hash = None
+        self._ponder_id = 0
+        self._last_ponder_cancelled = 0
 
     @property
     def interrupted(self):
         return self._interrupted
 
+    @property
+    def num_nodes(self):
+        return self._num_nodes + self._num_quiescence_nodes
+
     def interrupt(self):
         print("call interrupt")
         self._interrupted = True
 
-    def start(self, board, color):
-        self._best_move_gen = self.gen_best_move(board, color)
+    def new_game(self):
+        self._board_cache.new_game()
+
+    def close(self):
+        """
+        Shuts down the helper processes and releases the shared table and
+        the opening book.
+        """
+        if self._helpers:
+            for helper, jobs in self._helpers:
+                jobs.put(None)
+                helper.join()
+            self._helpers = None
+        self._board_cache.close(unlink=True)
+        if self._opening_book is not None:
+            self._opening_book.close()
+            self._opening_book = None
+
+    def _start_helpers(self):
+        context = get_context("spawn")
+        self._helper_results = context.Queue()
+        self._helper_stop = context.Event()
+        self._helpers = []
+        for helper_index in range(1, self._num_helpers + 1):
+            jobs = context.Queue()
+            helper = context.Process(target=_run_helper, args=(
+                self._board_cache.shared_name, self._board_cache.size_mb,
+                helper_index, jobs, self._helper_results, self._helper_stop))
+            helper.daemon = True
+            helper.start()
+            self._helpers.append((helper, jobs))
+
+    def _start_helper_search(self, board, color):
+        """
+        Sends the root position to every helper, which then search alongside
+        the main search until `_stop_helper_search` is called.
+        """
+        if not self._helpers:
+            self._start_helpers()
+        self._helper_stop.clear()
+        for _, jobs in self._helpers:
+            jobs.put((board, color, self._board_cache.generation))
+        self._num_helpers_searching = len(self._helpers)
+
+    def _stop_helper_search(self):
+        """
+        Stops the helpers and waits for them to finish.
+        Returns the number of nodes they searched.
+        """
+        if not self._num_helpers_searching:
+            return 0
+        self._helper_stop.set()
+        num_nodes = sum(self._helper_results.get() for _ in range(self._num_helpers_searching))
+        self._num_helpers_searching = 0
+        return num_nodes
+
+    def start(self, board, color, time_manager=None):
+        self._ponder_hash = None
+        self._time_manager = time_manager
+        self._best_move_gen = self.gen_best_move(board, color, time_manager)
+
+    def start_ponder(self, board, color, ponder_id):
+        """
+        Starts searching the position after the opponent's expected reply,
+        taken from the transposition table, as if it were already our turn.
+        The search runs without a time budget, up to `AGENT_MAX_PONDER_DEPTH`,
+        until it is converted by `ponder_hit` or cancelled by `stop_ponder`.
+        Returns False if no reply is known or the ponder has been cancelled.
+        """
+        if ponder_id <= self._last_ponder_cancelled:
+            return False
+
+        board = BitBoard.from_board(board)
+        enemy_unit = BoardCellState.next(color)
+        cached_entry = self._board_cache.probe(hash_board(board, enemy_unit))
+        if (not cached_entry or cached_entry.move is None
+        or not is_packed_move_legal(board, enemy_unit, cached_entry.move)):
+            return False
+
+        print(f"ponder {unpack_move(cached_entry.move)}")
+        apply_move(board, cached_entry.move)
+        self._time_manager = None
+        self._best_move_gen = self.gen_best_move(board, color, ponder=True)
+        self._ponder_id = ponder_id
+        self._ponder_hash = hash_board(board, color)
+        return True
+
+    def stop_ponder(self, ponder_id):
+        """
+        Cancels the given ponder search, whether or not it has started yet.
+        """
+        self._last_ponder_cancelled = max(self._last_ponder_cancelled, ponder_id)
+        self._ponder_hash = None
+        self.interrupt()
+
+    def ponder_hit(self, board, color, time_manager):
+        """
+        Converts the ponder search into the search for the given position if
+        that is the position being pondered, keeping the search's progress.
+        Returns False on a ponder miss or if the ponder search has ended.
+        """
+        ponder_hash, self._ponder_hash = self._ponder_hash, None
+        if ponder_hash is None or hash_board(BitBoard.from_board(board), color) != ponder_hash:
+            return False
+        self._time_manager = time_manager
+        return True
 
     def find_next_best_move(self):
+        """
+        Advances the current search to its next best move.
+        Returns the move, the `SearchStats` of the search so far, and whether
+        the search is over, in which case the move is None and the stats are
+        final.
+        """
         try:
-            best_move = next(self._best_move_gen)
+            best_move, stats = next(self._best_move_gen)
             done_search = False
         except StopIteration:
-            best_move = None
+            best_move, stats = None, self._stats
             done_search = True
-        return best_move, done_search
+        return best_move, stats, done_search
+
+    def _count_stats(self):
+        """
+        Gathers the agent's lifetime counters. Subtract an earlier count with
+        `SearchStats.since` to get those of a single search.
+        """
+        board_cache = self._board_cache
+        return SearchStats(
+            num_nodes=self._num_nodes + self._num_quiescence_nodes,
+            num_quiescence_nodes=self._num_quiescence_nodes,
+            num_table_probes=board_cache.num_probes,
+            num_table_hits=board_cache.num_hits,
+            num_table_cutoffs=self._num_table_cutoffs,
+            num_cutoffs=self._num_cutoffs,
+            num_first_move_cutoffs=self._num_first_move_cutoffs,
+            num_null_move_prunes=self._num_null_move_prunes,
+            num_late_move_reductions=self._num_late_move_reductions,
+            num_late_move_researches=self._num_late_move_researches,
+            num_terminal_nodes=self._num_terminal_nodes,
+            num_fail_lows=self._num_fail_lows,
+            num_fail_highs=self._num_fail_highs,
+        )
+
+    def _find_stats(self, baseline, time_start, best_move, best_score, **kwargs):
+        return replace(self._count_stats().since(baseline),
+            best_move=str(unpack_move(best_move)) if best_move is not None else None,
+            best_score=best_score,
+            depth=self._depth,
+            secs=time() - time_start,
+            iteration_secs=list(self._iteration_secs),
+            **kwargs)
+
+    def gen_best_move(self, board, color, time_manager=None, ponder=False):
+        """
+        Yields successively better moves for the given position, each with
+        the `SearchStats` of the search so far, until the search is
+        interrupted or, with a `TimeManager`, until it decides that the
+        search is over. The final stats are then kept as `_stats`.
+        """
+        try:
+            yield from self._gen_best_move(board, color, time_manager, ponder)
+        finally:
+            # a ponder search that has ended, on any path, cannot be converted
+            if ponder:
+                self._ponder_hash = None
+
+    def _gen_best_move(self, board, color, time_manager, ponder):
+        board = BitBoard.from_board(board)
+        book_move = self._find_book_move(board, color)
+        if book_move is not None:
+            print(f"book move {unpack_move(book_move)}")
+            self._stats = SearchStats(best_move=str(unpack_move(book_move)), from_book=True, done=True)
+            yield unpack_move(book_move), self._stats
+            return
 
-    def gen_best_move(self, board, color):
         if not self._should_use_lookaheads(board, color):
-            moves = enumerate_player_moves(board, color)
+            moves = generate_moves(board, color)
             moves.sort(
-                key=lambda move: heuristic(apply_move(deepcopy(board), move), color),
+                key=lambda move: _estimate_move_heuristic(board, move, color),
                 reverse=True
             )
-            yield moves[0] if moves else None
+            best_move = unpack_move(moves[0]) if moves else None
+            self._stats = SearchStats(best_move=best_move and str(best_move), done=True)
+            yield best_move, self._stats
             return
 
-        old_branches_explored = self._num_branches_explored
+        baseline = self._count_stats()
+        self._depth = 0
+        self._iteration_secs = []
+        best_move = None
+        best_score = None
+        time_start = time()
 
         self._interrupted = False
+        if ponder and self._ponder_id <= self._last_ponder_cancelled:
+            # cancelled before the search could start
+            self._stats = SearchStats(done=True)
+            return
+
+        # a ponder search gets its time manager later on from `ponder_hit`
+        if time_manager:
+            self._time_manager = time_manager
         try:
-            search_gen = self._gen_search(board, color)
-            while True:
-                best_move = next(search_gen)
-                yield best_move
-        except (TimerInterrupt, StopIteration):
-            self._interrupted = True
+            for best_move, best_score in self._gen_search(board, color):
+                yield unpack_move(best_move), self._find_stats(baseline, time_start, best_move, best_score)
+        except TimerInterrupt:
+            pass
         finally:
-            # main_line = _find_main_line(board, best_move, transposition_table=self._board_cache)
-            # print(main_line)
-            new_branches_explored = self._num_branches_explored - old_branches_explored
-            print(f"explored {new_branches_explored} subtrees")
-
-    def _gen_search(self, board, color):
-        depth = 1
+            self._interrupted = True
+            self._time_manager = None
+            num_helper_nodes = self._stop_helper_search()
+            self._stats = self._find_stats(baseline, time_start, best_move, best_score, done=True)
+            self._stats.num_nodes += num_helper_nodes
+            self._stats.num_helper_nodes = num_helper_nodes
+            print(f"search stats: {self._stats}")
+            board_cache = self._board_cache
+            print(f"transposition table: {board_cache.occupancy:.1%} full,"
+                f" {board_cache.num_bucket_conflicts} bucket conflicts")
+            PROFILING and profiler.report(title="search profile")
+
+    def _find_book_move(self, board, color):
+        if not self._opening_book:
+            return None
+        book_entry = self._opening_book.probe(hash_board(board, color))
+        if book_entry and is_packed_move_legal(board, color, book_entry.move):
+            return book_entry.move
+        return None
+
+    def _gen_search(self, board, color, helper_index=0):
+        """
+        Runs iterative deepening from the given position, yielding each new
+        best move and its score. Each iteration starts with an aspiration
+        window around the previous iteration's score, widened on the side
+        that fails following `AGENT_ASPIRATION_WINDOWS` until it is
+        unbounded. Lazy SMP helpers (nonzero `helper_index`) join the
+        current search generation instead of starting one, and
+        desynchronize from the main search by starting on alternate depths
+        with their root moves rotated.
+        """
+        depth = 1 + helper_index % 2
         best_move = None
-        moves = enumerate_player_moves(board, color)
-        board_hash = hash_board(board)
-        temp_board = deepcopy(board)
+        best_score = None
+        moves = list(StagedMoveGenerator(board, color))
+        board_hash = hash_board(board, color)
+        self._evaluator = IncrementalHeuristic(board)
+        self._move_ordering.new_search()
+
+        if helper_index:
+            rotation = helper_index % len(moves) if moves else 0
+            moves = moves[rotation:] + moves[:rotation]
+        else:
+            self._board_cache.new_search()
+            self._num_helpers and self._start_helper_search(deepcopy(board), color)
 
-        time_start = time()
+        if not helper_index and self._time_manager and len(moves) == 1:
+            print("only one legal move")
+            yield moves[0], None
+            return
 
-        while not self._interrupted:
-            print(f"init search at depth {depth}")
-            alpha = -inf
-            if best_move is None:
-                moves.sort(key=lambda move: _estimate_move_score(board, move))
-            elif best_move in moves:
+        while not self._interrupted and depth <= MAX_DEPTH:
+            iteration_start = time()
+            self._depth = depth
+            if best_move in moves:
                 moves.remove(best_move)
                 moves.insert(0, best_move)
 
-            self._num_plies_expanded += 1
-            self._num_branches_explored += len(moves)
-            self._num_branches_enumerated += len(moves)
+            windows = AGENT_ASPIRATION_WINDOWS if best_score is not None else ()
+            alpha, beta = ((best_score - windows[0], best_score + windows[0])
+                if windows
+                else (-inf, inf))
+            num_researches = 0
 
-            for move in moves:
-                temp_board.mimic(board)
-                move_board = apply_move(temp_board, move)
-                move_hash = update_hash(board_hash, board, move)
-                if move == moves[0]:
-                    move_score = -self._inverse_search(move_board, move_hash, color, depth - 1, -inf, -alpha, -1)
+            while True:
+                move_score = -inf
+                for best_move, move_score in self._gen_root_search(board, board_hash, color, moves, depth, alpha, beta):
+                    yield best_move, move_score
+
+                if alpha < move_score < beta or alpha == -inf and beta == inf:
+                    break
+
+                num_researches += 1
+                window = windows[num_researches] if num_researches < len(windows) else inf
+                if move_score <= alpha:
+                    self._num_fail_lows += 1
+                    alpha = best_score - window
                 else:
-                    move_score = -self._inverse_search(move_board, move_hash, color, depth - 1, -alpha - 1, -alpha, -1)
-                    if move_score > alpha:
-                        move_score = -self._inverse_search(move_board, move_hash, color, depth - 1, -inf, -move_score, -1)
-
-                if move_score > alpha:
-                    alpha = move_score
-                    best_move = move
-                    yield best_move
-                    print(f"average effective branching factor: {self._num_branches_explored / self._num_plies_expanded:.2f}/{self._num_branches_enumerated / self._num_plies_expanded:.2f}")
+                    self._num_fail_highs += 1
+                    beta = best_score + window
+                    moves.remove(best_move)
+                    moves.insert(0, best_move)
 
+            best_score = move_score
             if self._interrupted:
                 break
 
-            print(f"complete search at depth {depth} in {format_secs(time() - time_start)}")
+            self._iteration_secs.append(time() - iteration_start)
+            # a decided score cannot change with more depth
+            if abs(best_score) >= WIN_THRESHOLD:
+                print(f"decided at depth {depth} ({best_score})")
+                break
             depth += 1
 
+            # a ponder search has no time manager until `ponder_hit`
+            if not helper_index and self._ponder_hash is not None and depth > AGENT_MAX_PONDER_DEPTH:
+                print(f"stop ponder search before depth {depth}")
+                break
 
-    def _inverse_search(self, board, board_hash, perspective, depth, alpha, beta, color):
+            time_manager = self._time_manager if not helper_index else None
+            if time_manager:
+                time_manager.record_iteration(best_move, best_score)
+                if not time_manager.should_start_iteration():
+                    print(f"stop search before depth {depth} at {time_manager.elapsed:.2f}s"
+                        f" (target {time_manager.target:.2f}s, limit {time_manager.hard_limit:.2f}s)")
+                    break
+
+
+    def _gen_root_search(self, board, board_hash, color, moves, depth, alpha=-inf, beta=inf):
+        """
+        Searches the given root moves in order to a fixed depth within the
+        given window, yielding the move and score of each new best move.
+        Stops early once a move fails high, i.e. scores at least beta.
+        """
+        for move in moves:
+            move_score = self._search_root_move(board, board_hash, color, move, depth, alpha, beta,
+                full_window=move == moves[0])
+            if move_score > alpha:
+                alpha = move_score
+                yield move, move_score
+                if move_score >= beta:
+                    break
+
+    def _search_root_move(self, board, board_hash, color, move, depth, alpha, beta=inf, full_window=False):
+        """
+        Searches a single root move. Unless a full window is requested or
+        alpha is -inf, the move is first searched with a null window and only
+        re-searched if it fails high, so scores at or below alpha are upper
+        bounds. Scores at or above beta are lower bounds.
+        """
+        move_record = apply_move(board, move)
+        move_hash = update_hash_from_record(board_hash, board, move_record)
+        ENABLED_HASH_VERIFICATION and verify_hash(move_hash, board, BoardCellState.next(color))
+        self._evaluator.update(move_record)
+        try:
+            if full_window or alpha == -inf:
+                move_score = -self._inverse_search(board, move_hash, color, depth - 1, -beta, -alpha, -1, move)
+            else:
+                move_score = -self._inverse_search(board, move_hash, color, depth - 1, -alpha - 1, -alpha, -1, move)
+                if alpha < move_score < beta:
+                    move_score = -self._inverse_search(board, move_hash, color, depth - 1, -beta, -move_score, -1, move)
+        finally:
+            undo_move(board, move_record)
+            self._evaluator.revert()
+        return move_score
+
+    def search_depth(self, board, color, depth):
+        """
+        Searches the given position to a fixed depth without iterative
+        deepening. Returns the best packed move and its score.
+        """
+        board = BitBoard.from_board(board)
+        moves = generate_moves(board, color)
+        self._interrupted = False
+        self._board_cache.new_search()
+        self._evaluator = IncrementalHeuristic(board)
+        self._move_ordering.new_search()
+
+        best_move, best_score = None, -inf
+        for best_move, best_score in self._gen_root_search(board, hash_board(board, color), color, moves, depth):
+            pass
+        return best_move, best_score
+
+    def search_move(self, board, color, move, depth, alpha=-inf):
+        """
+        Searches a single root move to a fixed depth against the given alpha.
+        See `_search_root_move` for the meaning of the returned score.
+        """
+        board = BitBoard.from_board(board)
+        self._interrupted = False
+        self._evaluator = IncrementalHeuristic(board)
+        return self._search_root_move(board, hash_board(board, color), color, move, depth, alpha)
+
+    def _inverse_search(self, board, board_hash, perspective, depth, alpha, beta, color, previous_move=None, ply=1):
+        """
+        Searches the given position with principal variation search.
+        `previous_move` is the move that led here, or None after a null move.
+        """
         if self._interrupted:
             print("receive interrupt")
             raise TimerInterrupt()
 
-        if board_hash in self._board_cache and self._board_cache[board_hash].depth >= depth:
-            cached_entry = self._board_cache[board_hash]
+        self._num_nodes += 1
+        if not self._num_nodes & 0xFF and self._time_manager and self._time_manager.out_of_time():
+            print("run out of time")
+            self._interrupted = True
+            raise TimerInterrupt()
+
+        # only the side to move can have just lost its last marble
+        player_unit = perspective if color == 1 else BoardCellState.next(perspective)
+        if self._evaluator.count_marbles(player_unit) <= MIN_MARBLES:
+            self._num_terminal_nodes += 1
+            return -WIN_SCORE + ply
+
+        # neither side can do better than winning on the next move
+        alpha = max(alpha, -WIN_SCORE + ply)
+        beta = min(beta, WIN_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+
+        time_start = PROFILING and profiler.start()
+        cached_entry = self._board_cache.probe(board_hash)
+        PROFILING and profiler.stop("table probe", time_start)
+        if cached_entry and cached_entry.depth >= depth:
+            cached_score = _score_from_table(cached_entry.score, ply)
             if cached_entry.type == TranspositionTable.EntryType.PV:
-                return cached_entry.score
+                self._num_table_cutoffs += 1
+                return cached_score
             elif cached_entry.type == TranspositionTable.EntryType.CUT:
-                alpha = max(alpha, cached_entry.score)
+                alpha = max(alpha, cached_score)
             elif cached_entry.type == TranspositionTable.EntryType.ALL:
-                beta = min(beta, cached_entry.score)
-        else:
-            cached_entry = None
+                beta = min(beta, cached_score)
+            if alpha >= beta:
+                self._num_table_cutoffs += 1
+                return cached_score
 
         if depth == 0:
-            return heuristic(board, perspective) * color
+            return self._quiescence_search(board, perspective, alpha, beta, color, ply)
+
+        enemy_unit = BoardCellState.next(player_unit)
+
+        # give the opponent a free move: if they still cannot reach beta, this
+        # node is very likely to fail high. Skipped in PV nodes, right after
+        # another null move, and with few marbles left, where passing can be
+        # better than any legal move
+        if (self._null_move_pruning
+        and depth >= 2
+        and beta - alpha <= 1
+        and previous_move is not None
+        and board.mask(player_unit).bit_count() >= AGENT_NULL_MOVE_MIN_MARBLES
+        and self._evaluator.evaluate(perspective) * color >= beta):
+            null_move_reduction = 2 + (depth >= 6)
+            null_move_score = -self._inverse_search(board, board_hash ^ ZOBRIST_TURN, perspective,
+                max(depth - 1 - null_move_reduction, 0), -beta, -beta + 1, -color, None, ply + 1)
+            if null_move_score >= beta:
+                self._num_null_move_prunes += 1
+                # a win found after passing is not a real win
+                return null_move_score if null_move_score < WIN_THRESHOLD else beta
 
         best_score = -inf
         best_move = cached_entry.move if cached_entry else None
         alpha_old = alpha
-        player_unit = perspective if color == 1 else BoardCellState.next(perspective)
-        temp_board = deepcopy(board)
-        moves = enumerate_player_moves(board, player_unit)
-        if best_move and best_move in moves:
-            moves.remove(best_move)
-            moves.insert(0, best_move)
-
-        self._num_plies_expanded += 1
-        self._num_branches_enumerated += len(moves)
+        moves = StagedMoveGenerator(board, player_unit,
+            hash_move=best_move,
+            refutations=self._move_ordering.find_refutations(player_unit, ply, previous_move),
+            history=self._move_ordering.find_history(player_unit),
+        )
+        num_moves_searched = 0
 
         for move in moves:
             if self._interrupted:
                 print("receive interrupt")
                 raise TimerInterrupt()
 
-            temp_board.mimic(board)
-            move_board = apply_move(temp_board, move)
-            move_hash = update_hash(board_hash, board, move)
-
-            if move == moves[0]:
-                move_score = -self._inverse_search(move_board, move_hash, perspective, depth - 1, -beta, -alpha, -color)
+            is_quiet = board.get_index(MOVE_TARGET_CELLS[move]) != enemy_unit
+            time_start = PROFILING and profiler.start()
+            move_record = apply_move(board, move)
+            PROFILING and profiler.stop("apply", time_start)
+            time_start = PROFILING and profiler.start()
+            move_hash = update_hash_from_record(board_hash, board, move_record)
+            PROFILING and profiler.stop("hash", time_start)
+            ENABLED_HASH_VERIFICATION and verify_hash(move_hash, board, enemy_unit)
+            time_start = PROFILING and profiler.start()
+            self._evaluator.update(move_record)
+            PROFILING and profiler.stop("eval update", time_start)
+
+            if not num_moves_searched:
+                move_score = -self._inverse_search(board, move_hash, perspective, depth - 1, -beta, -alpha, -color, move, ply + 1)
             else:
-                move_score = -self._inverse_search(move_board, move_hash, perspective, depth - 1, -alpha - 1, -alpha, -color)
-                if move_score > alpha or move_score < beta:
-                    move_score = -self._inverse_search(move_board, move_hash, perspective, depth - 1, -beta, -move_score, -color)
+                # quiet moves ordered late are unlikely to raise alpha, so
+                # search them shallower first and only verify those that do
+                move_reduction = (1 + (num_moves_searched >= AGENT_LATE_MOVE_MIN_MOVES * 4)
+                    if self._late_move_reductions
+                    and is_quiet
+                    and depth >= 3
+                    and num_moves_searched >= AGENT_LATE_MOVE_MIN_MOVES
+                    else 0)
+                move_score = -self._inverse_search(board, move_hash, perspective, depth - 1 - move_reduction, -alpha - 1, -alpha, -color, move, ply + 1)
+                if move_reduction:
+                    self._num_late_move_reductions += 1
+                    if move_score > alpha:
+                        self._num_late_move_researches += 1
+                        move_score = -self._inverse_search(board, move_hash, perspective, depth - 1, -alpha - 1, -alpha, -color, move, ply + 1)
+                if alpha < move_score < beta:
+                    move_score = -self._inverse_search(board, move_hash, perspective, depth - 1, -beta, -alpha, -color, move, ply + 1)
+
+            undo_move(board, move_record)
+            self._evaluator.revert()
+            num_moves_searched += 1
 
             # print(player_unit, move, f"{move_score:.2f}")
             if move_score > best_score:
@@ -205,31 +666,78 @@ class Agent:
 
             alpha = max(alpha, best_score)
             if alpha >= beta:
-                self._num_branches_explored += moves.index(move) + 1
+                self._num_cutoffs += 1
+                self._num_first_move_cutoffs += num_moves_searched == 1
+                if is_quiet:
+                    self._move_ordering.record_cutoff(player_unit, ply, move, previous_move, depth)
                 break
-        else:
-            self._num_branches_explored += len(moves)
-
-        cached_entry = (self._board_cache[board_hash]
-            if board_hash in self._board_cache
-            else TranspositionTable.Entry(
-                score=best_score,
-                move=best_move,
-                depth=depth,
-            ))
-
-        cached_entry.score = best_score
-        cached_entry.move = best_move
-        cached_entry.depth = depth
-        if board_hash not in self._board_cache:
-            self._board_cache[board_hash] = cached_entry
 
         if best_score <= alpha_old:
-            cached_entry.type = TranspositionTable.EntryType.ALL
+            entry_type = TranspositionTable.EntryType.ALL
         elif best_score >= beta:
-            cached_entry.type = TranspositionTable.EntryType.CUT
+            entry_type = TranspositionTable.EntryType.CUT
         else:
-            cached_entry.type = TranspositionTable.EntryType.PV
+            entry_type = TranspositionTable.EntryType.PV
+
+        self._board_cache.store(board_hash,
+            score=_score_to_table(best_score, ply),
+            depth=depth,
+            move=best_move,
+            type=entry_type,
+        )
+
+        return best_score
+
+    def _quiescence_search(self, board, perspective, alpha, beta, color, ply, depth=AGENT_QUIESCENCE_DEPTH):
+        """
+        Extends the search past the horizon with sumitos only, so that leaves
+        are not scored in the middle of a pushing exchange. The side to move
+        may stand pat on the static evaluation, and with delta pruning,
+        sumitos that cannot raise it above alpha even with a margin for
+        positional gains are pruned.
+        """
+        player_unit = perspective if color == 1 else BoardCellState.next(perspective)
+        if self._evaluator.count_marbles(player_unit) <= MIN_MARBLES:
+            self._num_terminal_nodes += 1
+            return -WIN_SCORE + ply
+
+        time_start = PROFILING and profiler.start()
+        stand_pat = self._evaluator.evaluate(perspective) * color
+        PROFILING and profiler.stop("eval", time_start)
+        if stand_pat >= beta or not depth:
+            return stand_pat
+
+        best_score = stand_pat
+        alpha = max(alpha, stand_pat)
+        time_start = PROFILING and profiler.start()
+        ejections, pushes = generate_sumitos(board, player_unit)
+        PROFILING and profiler.stop("move gen", time_start)
+
+        for move_gain, moves in ((EJECTION_GAIN, ejections), (0, pushes)):
+            for move in moves:
+                if self._delta_pruning and stand_pat + move_gain + AGENT_QUIESCENCE_DELTA_MARGIN <= alpha:
+                    break
+
+                if self._interrupted:
+                    print("receive interrupt")
+                    raise TimerInterrupt()
+
+                self._num_quiescence_nodes += 1
+                time_start = PROFILING and profiler.start()
+                move_record = apply_move(board, move)
+                PROFILING and profiler.stop("apply", time_start)
+                time_start = PROFILING and profiler.start()
+                self._evaluator.update(move_record)
+                PROFILING and profiler.stop("eval update", time_start)
+                move_score = -self._quiescence_search(board, perspective, -beta, -alpha, -color, ply + 1, depth - 1)
+                undo_move(board, move_record)
+                self._evaluator.revert()
+
+                if move_score > best_score:
+                    best_score = move_score
+                    alpha = max(alpha, best_score)
+                    if alpha >= beta:
+                        return best_score
 
         return best_score
 
@@ -238,6 +746,6 @@ class Agent:
         for cell, cell_state in board.enumerate():
             if cell_state != player_unit:
                 continue
-            if next((n for n in Hex.neighbors(cell) if board[n] == BoardCellState.next(player_unit)), False):
+            if next((n for n in CELL_NEIGHBORS[cell] if board[n] == BoardCellState.next(player_unit)), False):
                 num_adjacent_enemies += 1
         return num_adjacent_enemies >= 2
@@ -1,9 +1,11 @@
 from math import pow, inf
 from core.hex import Hex
 from core.board_cell_state import BoardCellState
+from core.cells import CELL_INDICES, CELL_NEIGHBORS, CENTER_DISTANCES
+from core.bitboard import CELL_BITS, NEIGHBOR_MASKS, iterate_bits
 from core.game import find_board_score
 from config import BOARD_SIZE, NUM_EJECTED_MARBLES_TO_WIN
-from debug.profiler import MeanProfiler
+from debug.profiler import PROFILING, profiler
 
 
 WEIGHT_SCORE = 25
@@ -12,20 +14,17 @@ WEIGHT_CENTRALIZATION = 2
 WEIGHT_CENTRALIZATION_OPPONENT = 1
 WEIGHT_ADJACENCY = 0.1
 WEIGHT_ADJACENCY_OPPONENT = 0.05
-
-profiler = MeanProfiler()
+MAX_MARBLES = 14
 
 
 def heuristic(board, player_unit):
-    # profiler.start()
+    time_start = PROFILING and profiler.start()
     score = _heuristic_optimized(board, player_unit)
-    # profiler.stop(label="avg heuristic speed")
+    PROFILING and profiler.stop("heuristic", time_start)
     return score
 
 def _heuristic_optimized(board, color):
-    MAX_MARBLES = 14
     BOARD_RADIUS = BOARD_SIZE - 1
-    BOARD_CENTER = Hex(BOARD_RADIUS, BOARD_RADIUS)
 
     heuristic_score = MAX_MARBLES
     heuristic_score_opponent = MAX_MARBLES
@@ -38,8 +37,8 @@ def _heuristic_optimized(board, color):
         if cell_color == BoardCellState.EMPTY:
             continue
 
-        cell_centralization = BOARD_RADIUS - Hex.manhattan(cell, BOARD_CENTER)
-        cell_adjacency = pow(sum([board[n] == cell_color for n in Hex.neighbors(cell)]), 2)
+        cell_centralization = BOARD_RADIUS - CENTER_DISTANCES[CELL_INDICES[cell]]
+        cell_adjacency = pow(sum([board[n] == cell_color for n in CELL_NEIGHBORS[cell]]), 2)
 
         if cell_color == color:
             heuristic_centralization += cell_centralization
@@ -59,6 +58,113 @@ def _heuristic_optimized(board, color):
         - WEIGHT_ADJACENCY_OPPONENT * heuristic_adjacency_opponent
     )
 
+class IncrementalHeuristic:
+    """
+    Maintains the terms of `_heuristic_optimized` for both colors as running
+    totals over a `BitBoard`, so that a position can be evaluated without
+    rescanning the board.
+    Call `update` after each `apply_move` and `revert` after each matching
+    `undo_move`; updates only visit the changed cells and their neighbors.
+    """
+
+    def __init__(self, board):
+        self._board = board
+        self._deltas = []
+        # indexed by BoardCellState.value
+        self._counts = [0, 0, 0]
+        self._centralization = [0, 0, 0]
+        self._adjacency = [0, 0, 0]
+
+        masks = (0, board.black, board.white)
+        for unit in (BoardCellState.BLACK, BoardCellState.WHITE):
+            unit_mask = masks[unit.value]
+            for cell in iterate_bits(unit_mask):
+                self._counts[unit.value] += 1
+                self._centralization[unit.value] += BOARD_SIZE - 1 - CENTER_DISTANCES[cell]
+                self._adjacency[unit.value] += (NEIGHBOR_MASKS[cell] & unit_mask).bit_count() ** 2
+
+    def count_marbles(self, color):
+        return self._counts[color.value]
+
+    def evaluate(self, color):
+        """
+        Evaluates the board from the perspective of the given color.
+        Matches `_heuristic_optimized(board, color)` exactly.
+        """
+        enemy = BoardCellState.next(color).value
+        color = color.value
+        return (
+            WEIGHT_SCORE * (MAX_MARBLES - self._counts[enemy])
+            - WEIGHT_SCORE_OPPONENT * (MAX_MARBLES - self._counts[color])
+            + WEIGHT_CENTRALIZATION * self._centralization[color]
+            - WEIGHT_CENTRALIZATION_OPPONENT * self._centralization[enemy]
+            + WEIGHT_ADJACENCY * self._adjacency[color]
+            - WEIGHT_ADJACENCY_OPPONENT * self._adjacency[enemy]
+        )
+
+    def update(self, record):
+        """
+        Updates the totals for a move that has just been applied to the board.
+        """
+        board = self._board
+        black_after = board.black
+        white_after = board.white
+        black_before = black_after
+        white_before = white_after
+        region_mask = 0
+        delta = [0] * 6
+
+        for cell, cell_state in zip(record.cells, record.states):
+            cell_bit = CELL_BITS[cell]
+            region_mask |= cell_bit | NEIGHBOR_MASKS[cell]
+            black_before &= ~cell_bit
+            white_before &= ~cell_bit
+            if cell_state == BoardCellState.BLACK:
+                black_before |= cell_bit
+            elif cell_state == BoardCellState.WHITE:
+                white_before |= cell_bit
+
+        changed_mask = (black_before ^ black_after) | (white_before ^ white_after)
+        for cell in iterate_bits(changed_mask):
+            cell_bit = CELL_BITS[cell]
+            cell_centralization = BOARD_SIZE - 1 - CENTER_DISTANCES[cell]
+            for i, (mask_before, mask_after) in enumerate(((black_before, black_after), (white_before, white_after))):
+                if mask_before & cell_bit:
+                    delta[i] -= 1
+                    delta[i + 2] -= cell_centralization
+                if mask_after & cell_bit:
+                    delta[i] += 1
+                    delta[i + 2] += cell_centralization
+
+        for cell in iterate_bits(region_mask):
+            cell_bit = CELL_BITS[cell]
+            neighbor_mask = NEIGHBOR_MASKS[cell]
+            for i, (mask_before, mask_after) in enumerate(((black_before, black_after), (white_before, white_after))):
+                if mask_before & cell_bit:
+                    delta[i + 4] -= (neighbor_mask & mask_before).bit_count() ** 2
+                if mask_after & cell_bit:
+                    delta[i + 4] += (neighbor_mask & mask_after).bit_count() ** 2
+
+        self._apply_delta(delta, 1)
+        self._deltas.append(delta)
+
+    def revert(self):
+        """
+        Reverts the totals to before the most recent `update`.
+        """
+        self._apply_delta(self._deltas.pop(), -1)
+
+    def _apply_delta(self, delta, sign):
+        black = BoardCellState.BLACK.value
+        white = BoardCellState.WHITE.value
+        self._counts[black] += sign * delta[0]
+        self._counts[white] += sign * delta[1]
+        self._centralization[black] += sign * delta[2]
+        self._centralization[white] += sign * delta[3]
+        self._adjacency[black] += sign * delta[4]
+        self._adjacency[white] += sign * delta[5]
+
+
 def _heuristic_total(board, player_unit):
     return (
         (WEIGHT_SCORE := 50) * _heuristic_score(board, player_unit)
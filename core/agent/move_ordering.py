@@ -0,0 +1,61 @@
+from core.packed_move import NUM_MOVE_CODES
+
+
+class MoveOrdering:
+    """
+    Tracks which quiet (non-sumito) moves caused beta cutoffs during a search,
+    so that interior nodes can try likely refutations early:
+    - killer moves: the latest cutoff moves at each ply
+    - history: a butterfly table per side, indexed by packed move (i.e. by
+      selected cells and direction) and weighted by remaining depth
+    - countermoves: the latest cutoff move played in reply to each
+      opponent move
+    Tables are indexed by `BoardCellState.value`.
+    """
+
+    NUM_KILLERS = 2
+
+    def __init__(self):
+        self._killers = []
+        self._history = [None, [0] * NUM_MOVE_CODES, [0] * NUM_MOVE_CODES]
+        self._countermoves = [None, [None] * NUM_MOVE_CODES, [None] * NUM_MOVE_CODES]
+
+    def new_search(self):
+        """
+        Forgets killers, which are tied to plies of the previous search, and
+        ages the history so that recent cutoffs weigh more.
+        """
+        self._killers = []
+        for history in self._history[1:]:
+            for move, score in enumerate(history):
+                if score:
+                    history[move] = score >> 1
+
+    def find_history(self, player_unit):
+        return self._history[player_unit.value]
+
+    def find_refutations(self, player_unit, ply, previous_move):
+        """
+        Finds the killer moves for the given ply followed by the countermove
+        to the previous move, if any.
+        """
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        countermove = (self._countermoves[player_unit.value][previous_move]
+            if previous_move is not None
+            else None)
+        return (*killers, countermove) if countermove is not None else killers
+
+    def record_cutoff(self, player_unit, ply, move, previous_move, depth):
+        """
+        Records a quiet move that caused a beta cutoff at the given ply.
+        """
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[MoveOrdering.NUM_KILLERS:]
+
+        self._history[player_unit.value][move] += depth * depth
+        if previous_move is not None:
+            self._countermoves[player_unit.value][previous_move] = move
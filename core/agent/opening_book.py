@@ -0,0 +1,199 @@
+"""
+Opening book of precomputed moves, keyed by Zobrist hash (with the side to
+move folded in, see `hash_board`).
+
+A book file is a header followed by fixed-size records sorted by key, so
+that it can be memory-mapped and binary searched without being loaded.
+Books are built offline by searching every position reachable within the
+first few plies of the built-in layouts to a fixed depth; see `driver_book.py`
+for the build, merge, prune and inspect tools.
+"""
+
+import os
+import mmap
+from dataclasses import dataclass
+from struct import Struct
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.board_hasher import hash_board
+from core.game import apply_move, undo_move
+from core.agent.state_generator import generate_moves
+
+BOOK_LAYOUTS = (BoardLayout.STANDARD, BoardLayout.GERMAN_DAISY, BoardLayout.BELGIAN_DAISY)
+
+# magic, version, number of records
+HEADER = Struct("<4sHxxQ")
+# key, move, depth, score
+RECORD = Struct("<QHHf")
+MAGIC = b"ABOK"
+VERSION = 1
+
+
+class BookFormatError(Exception):
+    pass
+
+
+@dataclass
+class BookEntry:
+    move: int
+    score: float
+    depth: int
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file through a memory map.
+    """
+
+    def __init__(self, path):
+        with open(path, mode="rb") as file:
+            # mmap cannot map an empty file
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise BookFormatError(f"{path} is too short to be a book")
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_entries = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise BookFormatError(f"{path} is not a version {VERSION} book")
+        if len(self._buffer) != HEADER.size + num_entries * RECORD.size:
+            self.close()
+            raise BookFormatError(f"{path} is truncated")
+        self._num_entries = num_entries
+
+    def __len__(self):
+        return self._num_entries
+
+    def _find_key(self, index):
+        return RECORD.unpack_from(self._buffer, HEADER.size + index * RECORD.size)[0]
+
+    def probe(self, hash):
+        """
+        Looks up the entry for the given key.
+        Returns a `BookEntry`, or None if the book has no entry for the key.
+        """
+        low, high = 0, self._num_entries
+        while low < high:
+            mid = (low + high) // 2
+            if self._find_key(mid) < hash:
+                low = mid + 1
+            else:
+                high = mid
+
+        if low == self._num_entries:
+            return None
+        key, move, depth, score = RECORD.unpack_from(self._buffer, HEADER.size + low * RECORD.size)
+        return BookEntry(move=move, score=score, depth=depth) if key == hash else None
+
+    def items(self):
+        """
+        Yields every key and entry in key order.
+        """
+        for key, move, depth, score in RECORD.iter_unpack(self._buffer[HEADER.size:]):
+            yield key, BookEntry(move=move, score=score, depth=depth)
+
+    def close(self):
+        self._buffer.close()
+
+
+def read_book(path):
+    """
+    Reads a whole book into a dict of keys to entries.
+    """
+    book = OpeningBook(path)
+    try:
+        return dict(book.items())
+    finally:
+        book.close()
+
+def write_book(path, entries):
+    """
+    Writes a dict of keys to entries as a book file.
+    """
+    with open(path, mode="wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for key in sorted(entries):
+            entry = entries[key]
+            file.write(RECORD.pack(key, entry.move, entry.depth, entry.score))
+
+def merge_books(books):
+    """
+    Merges dicts of keys to entries, keeping the deepest entry for each key
+    and the last one given on ties.
+    """
+    merged = {}
+    for book in books:
+        for key, entry in book.items():
+            if key not in merged or entry.depth >= merged[key].depth:
+                merged[key] = entry
+    return merged
+
+def prune_book(book, min_depth=0, max_plies=None):
+    """
+    Drops entries searched shallower than `min_depth` and, if `max_plies` is
+    given, entries for positions not reachable from the built-in layouts
+    within that many plies.
+    """
+    reachable = (set(position_hash for _, _, position_hash in _iterate_positions(max_plies))
+        if max_plies is not None
+        else None)
+    return {key: entry for key, entry in book.items()
+        if entry.depth >= min_depth
+        and (reachable is None or key in reachable)}
+
+def _iterate_positions(num_plies):
+    """
+    Yields each distinct position (board, side to move and hash) at which a
+    move is made within the first `num_plies` plies of the built-in layouts.
+    """
+    visited = set()
+
+    def visit(board, color, ply):
+        board_hash = hash_board(board, color)
+        if ply >= num_plies or board_hash in visited:
+            return
+        visited.add(board_hash)
+        yield board, color, board_hash
+        for move in generate_moves(board, color):
+            move_record = apply_move(board, move)
+            yield from visit(board, BoardCellState.next(color), ply + 1)
+            undo_move(board, move_record)
+
+    for layout in BOOK_LAYOUTS:
+        yield from visit(BitBoard.from_board(BoardLayout.setup_board(layout)), BoardCellState.BLACK, 0)
+
+
+_worker_agent = None
+
+def _setup_worker():
+    global _worker_agent
+    from core.agent import Agent
+    _worker_agent = Agent(num_helpers=0, opening_book_path=None)
+
+def _search_position(board, color, depth):
+    return _worker_agent.search_depth(board, color, depth)
+
+def build_book(num_plies, depth, max_workers=None, on_progress=None):
+    """
+    Searches every position reachable within the first `num_plies` plies of
+    the built-in layouts to the given depth across a process pool.
+    Returns a dict of keys to entries.
+    """
+    positions = [(board.copy(), color, board_hash)
+        for board, color, board_hash in _iterate_positions(num_plies)]
+
+    book = {}
+    with ProcessPoolExecutor(max_workers=max_workers,
+            mp_context=get_context("spawn"), initializer=_setup_worker) as executor:
+        results = executor.map(_search_position,
+            [board for board, _, _ in positions],
+            [color for _, color, _ in positions],
+            [depth] * len(positions))
+        for i, ((_, _, board_hash), (move, score)) in enumerate(zip(positions, results)):
+            if move is not None:
+                book[board_hash] = BookEntry(move=move, score=score, depth=depth)
+            on_progress and on_progress(i + 1, len(positions))
+    return book
@@ -3,21 +3,26 @@ from multiprocessing.managers import BaseManager
 from queue import Empty
 from time import time
 from core.agent import Agent
-from config import AGENT_MAX_SEARCH_SECS, AGENT_SEC_THRESHOLD
+from core.agent.time_manager import TimeManager
+from config import AGENT_MAX_SEARCH_SECS, AGENT_SEC_THRESHOLD, ENABLED_PONDERING, AGENT_STATS_PATH
 
 
-def worker(queue, agent, board, color):
-    agent.start(board, color)
+def worker(queue, agent, board, color, time_manager, ponder_id=None):
+    if ponder_id is not None:
+        if not agent.start_ponder(board, color, ponder_id):
+            return
+    else:
+        agent.start(board, color, time_manager)
     best_move = None
     next_best_move = None
     done_search = False
 
     while not done_search:
-        next_best_move, done_search = agent.find_next_best_move()
+        next_best_move, stats, done_search = agent.find_next_best_move()
         best_move = next_best_move or best_move
         if best_move or done_search:
             print("yield", best_move, done_search)
-            queue.put((best_move, done_search))
+            queue.put((best_move, stats, done_search))
 
 
 class AgentManager(BaseManager):
@@ -28,21 +33,33 @@ AgentManager.register("Agent", Agent)
 
 class AgentOperator:
 
-    def __init__(self):
+    def __init__(self, stats_path=AGENT_STATS_PATH):
         manager = AgentManager()
         manager.start()
         self._agent = manager.Agent()
-        self._agent_manager = None
+        self._agent_manager = manager
         self._queue = Queue()
         self._thread = None
         self._time = time()
+        self._time_limit = AGENT_MAX_SEARCH_SECS
         self._move = None
         self._done = False
+        self._pondering = False
+        self._ponder_id = 0
+        self._stats = None
+        self._stats_file = open(stats_path, mode="a", encoding="utf-8") if stats_path else None
 
     @property
     def time(self):
         return self._time
 
+    @property
+    def stats(self):
+        """
+        The `SearchStats` last received from the search.
+        """
+        return self._stats
+
     @property
     def done(self):
         return self._done
@@ -52,23 +69,96 @@ class AgentOperator:
             self._queue.get()
             self._queue.task_done()
 
-    def start_search(self, board, color):
+    def start_search(self, board, color, time_limit=AGENT_MAX_SEARCH_SECS, moves_left=None, clock_left=None):
+        """
+        Starts searching for a move in the background.
+        The search budget is derived from the per-move time limit and, if
+        given, the remaining moves and game clock (see `TimeManager`).
+        """
+        time_manager = TimeManager(time_limit, moves_left, clock_left)
+        if self._pondering:
+            self._pondering = False
+            # a ponder search that has already ended cannot be taken over
+            if self._thread.is_alive() and self._agent.ponder_hit(board, color, time_manager):
+                print("ponder hit")
+                self._reset_search(time_limit)
+                return self._thread
+            print("ponder miss")
+            self._stop_ponder_search()
+
         if self._thread:
             self._thread = None
 
         queue = Queue()
         self._queue = queue
 
-        thread = Process(target=worker, args=(queue, self._agent, board, color))
+        thread = Process(target=worker, args=(queue, self._agent, board, color, time_manager))
         thread.daemon = True
         thread.start()
         self._thread = thread
+        self._reset_search(time_limit)
+        return thread
 
+    def _reset_search(self, time_limit):
         self._time = time()
+        self._time_limit = time_limit
         self._move = None
         self._done = False
+        self._stats = None
+
+    def _record_stats(self, stats):
+        """
+        Keeps the given stats and, if a stats file was given, appends them
+        to it as a JSON line.
+        """
+        self._stats = stats
+        if self._stats_file:
+            self._stats_file.write(stats.to_json() + "\n")
+            self._stats_file.flush()
+
+    def start_pondering(self, board, color):
+        """
+        Searches the position after the opponent's expected reply in the
+        background while the opponent thinks. The next `start_search` turns
+        this search into the real one if the opponent plays that reply, and
+        cancels it otherwise.
+        """
+        if not ENABLED_PONDERING:
+            return
 
-        return thread
+        queue = Queue()
+        self._queue = queue
+
+        self._ponder_id += 1
+        thread = Process(target=worker, args=(queue, self._agent, board, color, None, self._ponder_id))
+        thread.daemon = True
+        thread.start()
+        self._thread = thread
+        self._pondering = True
+
+    def stop_pondering(self):
+        if self._pondering:
+            self._pondering = False
+            self._stop_ponder_search()
+
+    def _stop_ponder_search(self):
+        self._agent.stop_ponder(self._ponder_id)
+        self._thread.join()
+
+    def new_game(self):
+        self._thread and self._thread.is_alive() and self.stop_search()
+        self._agent.new_game()
+
+    def close(self):
+        """
+        Stops any search, then shuts down the agent's helpers and shared
+        table along with the process hosting the agent.
+        """
+        self.stop_pondering()
+        self._thread and self._thread.is_alive() and self.stop_search()
+        self._agent.close()
+        self._agent_manager.shutdown()
+        self._stats_file and self._stats_file.close()
 
     def stop_search(self):
         self._agent.interrupt()
@@ -80,12 +170,14 @@ class AgentOperator:
             is_search_complete = self._done
         else:
             try:
-                best_move, is_search_complete = self._queue.get(block=False)
+                best_move, stats, is_search_complete = self._queue.get(block=False)
                 print("dequeue", best_move)
+                self._record_stats(stats)
             except Empty:
                 best_move, is_search_complete = None, False
 
-            if time() - self._time >= AGENT_MAX_SEARCH_SECS + AGENT_SEC_THRESHOLD:
+            # the agent stops itself in time; this only guards against overruns
+            if time() - self._time >= self._time_limit + AGENT_SEC_THRESHOLD:
                 print("send interrupt")
                 self._agent.interrupt()
                 is_search_complete = True
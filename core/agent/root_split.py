@@ -0,0 +1,96 @@
+"""
+Root-splitting parallel search for fixed-depth analysis.
+
+The PV root move, taken from a shallower serial search, is searched
+serially to establish alpha. The remaining siblings are then farmed out to
+a process pool and searched with null windows against that alpha, and any
+that fail high are re-searched by the worker. Each worker keeps its own
+agent and transposition table, so no memory is shared between processes.
+
+Pruning that depends on the search window (null-move pruning, late move
+reductions and quiescence delta pruning) can score a sibling differently
+under the split's windows than under the serial search's, so agents here
+default to `EXACT_OPTIONS`, under which the split matches the serial
+search exactly. Pruning can be turned back on through the agent options,
+at the cost of results that are only close to the serial search's.
+"""
+
+import os
+from math import inf
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from core.agent import Agent
+from core.agent.state_generator import generate_moves
+from core.bitboard import BitBoard
+
+EXACT_OPTIONS = {
+    "null_move_pruning": False,
+    "late_move_reductions": False,
+    "delta_pruning": False,
+}
+
+_worker_agent = None
+
+
+def _setup_worker(agent_options):
+    global _worker_agent
+    _worker_agent = Agent(num_helpers=0, **agent_options)
+
+def _search_sibling(board, color, move, depth, alpha):
+    return _worker_agent.search_move(board, color, move, depth, alpha)
+
+def create_executor(max_workers=None, **agent_options):
+    """
+    Creates a process pool whose workers each search with an agent created
+    with the given options (see `Agent`) over `EXACT_OPTIONS`. Workers are
+    capped at one per CPU, as extra workers only compete for the same CPUs.
+    """
+    return ProcessPoolExecutor(
+        max_workers=min(max_workers or os.cpu_count(), os.cpu_count()),
+        mp_context=get_context("spawn"),
+        initializer=_setup_worker,
+        initargs=({**EXACT_OPTIONS, **agent_options},),
+    )
+
+def search_root_split(board, color, depth, executor=None, agent=None):
+    """
+    Searches the given position to a fixed depth, splitting the root moves
+    across the given executor (see `create_executor`).
+    The serial part runs on the given agent, which should be created with
+    the same options as the executor's, or on an agent with `EXACT_OPTIONS`.
+    Returns the best packed move and its score, which match those of
+    `Agent.search_depth` at the same depth and options when window-dependent
+    pruning is disabled (see above), and are otherwise close to them.
+    """
+    board = BitBoard.from_board(board)
+    moves = generate_moves(board, color)
+    if not moves:
+        return None, -inf
+
+    owns_executor = executor is None
+    executor = executor or create_executor()
+    agent = agent or Agent(num_helpers=0, **EXACT_OPTIONS)
+    try:
+        # a shallower search finds the PV move and warms up the table
+        pv_move = agent.search_depth(board, color, depth - 1)[0] if depth > 1 else None
+        pv_move = pv_move if pv_move is not None else moves[0]
+        pv_index = moves.index(pv_move)
+        alpha = agent.search_move(board, color, pv_move, depth)
+
+        # moves before the PV move win ties in the serial search, so they
+        # are searched against a lower alpha to tell ties from worse moves
+        move_scores = [executor.submit(_search_sibling, board, color, move, depth,
+                alpha if index > pv_index else alpha - 1)
+            if index != pv_index else None
+            for index, move in enumerate(moves)]
+
+        # keep the first of equally scored moves, as the serial search does
+        best_move, best_score = None, -inf
+        for move, move_score in zip(moves, move_scores):
+            move_score = move_score.result() if move_score else alpha
+            if move_score > best_score:
+                best_move, best_score = move, move_score
+    finally:
+        owns_executor and executor.shutdown()
+
+    return best_move, best_score
@@ -0,0 +1,86 @@
+import json
+from dataclasses import dataclass, field, asdict, replace
+
+# counters that accumulate over an agent's lifetime, as opposed to fields
+# describing a single search
+COUNTER_FIELDS = (
+    "num_nodes", "num_quiescence_nodes",
+    "num_table_probes", "num_table_hits", "num_table_cutoffs",
+    "num_cutoffs", "num_first_move_cutoffs",
+    "num_null_move_prunes", "num_late_move_reductions", "num_late_move_researches",
+    "num_terminal_nodes", "num_fail_lows", "num_fail_highs",
+)
+
+
+@dataclass
+class SearchStats:
+    """
+    Statistics of one search, as yielded alongside each best move.
+    `num_nodes` includes quiescence and helper nodes. `depth` is the depth
+    of the iteration that found the best move, and `iteration_secs` holds
+    the time taken by each completed iteration.
+    """
+
+    best_move: str = None
+    best_score: float = None
+    depth: int = 0
+    secs: float = 0
+    num_nodes: int = 0
+    num_quiescence_nodes: int = 0
+    num_helper_nodes: int = 0
+    num_table_probes: int = 0
+    num_table_hits: int = 0
+    num_table_cutoffs: int = 0
+    num_cutoffs: int = 0
+    num_first_move_cutoffs: int = 0
+    num_null_move_prunes: int = 0
+    num_late_move_reductions: int = 0
+    num_late_move_researches: int = 0
+    num_terminal_nodes: int = 0
+    num_fail_lows: int = 0
+    num_fail_highs: int = 0
+    iteration_secs: list = field(default_factory=list)
+    from_book: bool = False
+    done: bool = False
+
+    @property
+    def nodes_per_sec(self):
+        return self.num_nodes / self.secs if self.secs else 0
+
+    @property
+    def table_hit_rate(self):
+        return self.num_table_hits / self.num_table_probes if self.num_table_probes else 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.num_first_move_cutoffs / self.num_cutoffs if self.num_cutoffs else 0
+
+    def since(self, baseline):
+        """
+        Returns a copy with the counters of the given earlier stats of the
+        same agent subtracted.
+        """
+        return replace(self, **{name: getattr(self, name) - getattr(baseline, name)
+            for name in COUNTER_FIELDS})
+
+    def to_json(self):
+        """
+        Serializes the stats, including derived rates, as one line of JSON.
+        """
+        return json.dumps({
+            **asdict(self),
+            "nodes_per_sec": self.nodes_per_sec,
+            "table_hit_rate": self.table_hit_rate,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+        })
+
+    def __str__(self):
+        return (f"depth {self.depth}, {self.num_nodes} nodes"
+            f" ({self.num_quiescence_nodes} in quiescence, {self.num_helper_nodes} by helpers)"
+            f" in {self.secs:.2f}s at {self.nodes_per_sec:.0f} nodes/sec;"
+            f" cutoffs on first move: {self.first_move_cutoff_rate:.1%} of {self.num_cutoffs};"
+            f" table: {self.table_hit_rate:.1%} hits, {self.num_table_cutoffs} cutoffs;"
+            f" null move prunes: {self.num_null_move_prunes},"
+            f" late move reductions: {self.num_late_move_reductions} ({self.num_late_move_researches} re-searched),"
+            f" decided positions: {self.num_terminal_nodes};"
+            f" aspiration re-searches: {self.num_fail_lows} on fail low, {self.num_fail_highs} on fail high")
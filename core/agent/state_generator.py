@@ -1,44 +1,200 @@
-from core.hex import Hex, HexDirection
-from core.move import Move
-from core.game import is_move_legal
-
-
-def enumerate_player_moves(board, player_unit):
-    player_moves = []
-    selection_shapes = _enumerate_selection_shapes(board, player_unit)
-    for selection_shape in selection_shapes:
-        selection_shape = tuple(selection_shape)
-        if len(selection_shape) == 1:
-            start = end = selection_shape[0]
+from core.board_cell_state import BoardCellState
+from core.bitboard import CELL_BITS, FULL_MASK, iterate_bits
+from core.cells import DIRECTIONS, OPPOSITE_DIRECTIONS, NEIGHBORS, RAYS
+from core.packed_move import (
+    NUM_DIRECTIONS, encode_move,
+    MOVE_PIECES, MOVE_TARGETS, MOVE_HEADS, MOVE_DIRECTIONS, MOVE_INLINE,
+)
+from config import MAX_MOVABLE_MARBLES
+from debug.profiler import PROFILING, profiler
+
+# directions in which a line of marbles runs towards higher cell indices;
+# walking lines only this way visits each line once
+FORWARD_DIRECTIONS = tuple(i for i, d in enumerate(DIRECTIONS)
+    if (d.value.y, d.value.x) > (0, 0))
+
+
+def generate_moves(board, player_unit):
+    """
+    Generates all legal moves for the given player as packed moves.
+    Walks each line of 1-3 friendly marbles and only emits moves that pass
+    the rules for inline, broadside and sumito moves.
+    """
+    return [*_generate_sumitos(board, player_unit),
+        *_generate_inline_moves(board, player_unit),
+        *_generate_broadside_moves(board, player_unit)]
+
+def generate_sumitos(board, player_unit):
+    """
+    Generates the legal sumitos for the given player as packed moves.
+    Returns a pair of lists: sumitos that eject a marble, and other pushes.
+    """
+    player_mask, enemy_mask, _ = _find_masks(board, player_unit)
+    ejections = []
+    pushes = []
+    for line, line_direction in _iterate_lines(player_mask):
+        num_attackers = len(line)
+        back_direction = OPPOSITE_DIRECTIONS[line_direction]
+        for head, direction in ((line[-1], line_direction), (line[0], back_direction)):
+            num_defenders = _count_defenders(head, direction, num_attackers, player_mask, enemy_mask)
+            if not num_defenders:
+                continue
+            move = encode_move(line[0], line[-1], direction)
+            if num_defenders == len(RAYS[head][direction]):
+                ejections.append(move)
+            else:
+                pushes.append(move)
+    return ejections, pushes
+
+def is_packed_move_legal(board, player_unit, move):
+    """
+    Determines if a packed move (e.g. a hash move) is legal for the given
+    player on the given board.
+    """
+    player_mask, enemy_mask, empty_mask = _find_masks(board, player_unit)
+    move_pieces = MOVE_PIECES[move]
+    if move_pieces is None or any(not player_mask & CELL_BITS[p] for p in move_pieces):
+        return False
+
+    if MOVE_INLINE[move]:
+        num_defenders = _count_defenders(MOVE_HEADS[move], MOVE_DIRECTIONS[move],
+            len(move_pieces), player_mask, enemy_mask)
+        return num_defenders is not None
+
+    return all(t is not None and empty_mask & CELL_BITS[t] for t in MOVE_TARGETS[move])
+
+
+def _find_masks(board, player_unit):
+    player_mask = board.mask(player_unit)
+    enemy_mask = board.mask(BoardCellState.next(player_unit))
+    empty_mask = FULL_MASK ^ (player_mask | enemy_mask)
+    return player_mask, enemy_mask, empty_mask
+
+def _iterate_lines(player_mask):
+    """
+    Yields every line of 2-3 friendly marbles once, along with the direction
+    it runs in.
+    """
+    for start in iterate_bits(player_mask):
+        for line_direction in FORWARD_DIRECTIONS:
+            line = (start,)
+            for cell in RAYS[start][line_direction][:MAX_MOVABLE_MARBLES - 1]:
+                if not player_mask & CELL_BITS[cell]:
+                    break
+                line += (cell,)
+                yield line, line_direction
+
+def _generate_sumitos(board, player_unit):
+    ejections, pushes = generate_sumitos(board, player_unit)
+    return ejections + pushes
+
+def _generate_inline_moves(board, player_unit):
+    player_mask, _, empty_mask = _find_masks(board, player_unit)
+    moves = ([], [])
+    for line, line_direction in _iterate_lines(player_mask):
+        back_direction = OPPOSITE_DIRECTIONS[line_direction]
+        for head, direction in ((line[-1], line_direction), (line[0], back_direction)):
+            target = NEIGHBORS[head][direction]
+            if target is not None and empty_mask & CELL_BITS[target]:
+                moves[len(line) == 2].append(encode_move(line[0], line[-1], direction))
+    return moves[0] + moves[1]
+
+def _generate_broadside_moves(board, player_unit):
+    player_mask, _, empty_mask = _find_masks(board, player_unit)
+    moves = ([], [], [])
+    for line, line_direction in _iterate_lines(player_mask):
+        back_direction = OPPOSITE_DIRECTIONS[line_direction]
+        for direction in range(NUM_DIRECTIONS):
+            if direction == line_direction or direction == back_direction:
+                continue
+            for cell in line:
+                target = NEIGHBORS[cell][direction]
+                if target is None or not empty_mask & CELL_BITS[target]:
+                    break
+            else:
+                moves[MAX_MOVABLE_MARBLES - len(line)].append(encode_move(line[0], line[-1], direction))
+
+    for start in iterate_bits(player_mask):
+        for direction, target in enumerate(NEIGHBORS[start]):
+            if target is not None and empty_mask & CELL_BITS[target]:
+                moves[-1].append(encode_move(start, start, direction))
+
+    return [move for stage_moves in moves for move in stage_moves]
+
+def _count_defenders(head, direction, num_attackers, player_mask, enemy_mask):
+    """
+    Counts the enemy marbles an inline move pushes.
+    Returns None if the move is illegal.
+    """
+    num_defenders = 0
+    for cell in RAYS[head][direction]:
+        cell_bit = CELL_BITS[cell]
+        if enemy_mask & cell_bit:
+            num_defenders += 1
+            if num_defenders >= num_attackers:
+                return None
+        elif player_mask & cell_bit:
+            return None
         else:
-            start, end = selection_shape
-        for direction in HexDirection:
-            move = Move(start, end, direction)
-            if is_move_legal(board, move):
-                player_moves.append(move)
-    return player_moves
-
-def _enumerate_selection_shapes(board, player_unit):
-    selection_shapes = []
-    for cell, color in board.enumerate():
-        if color is not player_unit:
-            continue
-        cell_selection_shapes = _enumerate_cell_selection_shapes(board, cell)
-        selection_shapes += [shape for shape in cell_selection_shapes if shape not in selection_shapes]
-    return selection_shapes
-
-def _enumerate_cell_selection_shapes(board, origin):
-    selection_shapes = [{origin, origin}]
-    for direction in HexDirection:
-        origin_color = board[origin]
-        cell = origin
-        shape = [cell]
-        while len(shape) < 3:
-            cell = Hex.add(cell, direction.value)
-            if board[cell] != origin_color:
-                break
-            shape.append(cell)
-            if len(shape) > 1:
-                selection_shapes.append({shape[0], shape[-1]})
-
-    return selection_shapes
+            return num_defenders
+
+    # the line runs off the board: only legal if it ejects a defender
+    return num_defenders or None
+
+
+class StagedMoveGenerator:
+    """
+    Lazily yields legal packed moves in stages, generating each stage only
+    once the previous one has been exhausted:
+    1. the hash move, if legal
+    2. sumitos, ejections first
+    3. refutations (e.g. killer moves and countermoves), if legal
+    4. remaining inline moves, larger groups first
+    5. broadside and single marble moves, larger groups first
+    Quiet moves in stages 4 and 5 are sorted by the given history scores,
+    falling back on the order above for ties.
+    """
+
+    STAGES = (
+        _generate_sumitos,
+        _generate_inline_moves,
+        _generate_broadside_moves,
+    )
+
+    def __init__(self, board, player_unit, hash_move=None, refutations=(), history=None):
+        self._board = board
+        self._player_unit = player_unit
+        self._hash_move = hash_move
+        self._refutations = refutations
+        self._history = history
+        self.num_generated = 0
+
+    def __iter__(self):
+        searched_moves = set()
+        hash_move = self._hash_move
+        if hash_move is not None and is_packed_move_legal(self._board, self._player_unit, hash_move):
+            searched_moves.add(hash_move)
+            self.num_generated += 1
+            yield hash_move
+
+        generate_sumitos, *generate_quiet_stages = StagedMoveGenerator.STAGES
+        time_start = PROFILING and profiler.start()
+        sumitos = [m for m in generate_sumitos(self._board, self._player_unit) if m not in searched_moves]
+        PROFILING and profiler.stop("move gen", time_start)
+        self.num_generated += len(sumitos)
+        yield from sumitos
+
+        for move in self._refutations:
+            if (move not in searched_moves and move not in sumitos
+            and is_packed_move_legal(self._board, self._player_unit, move)):
+                searched_moves.add(move)
+                self.num_generated += 1
+                yield move
+
+        for generate_stage in generate_quiet_stages:
+            time_start = PROFILING and profiler.start()
+            stage_moves = [m for m in generate_stage(self._board, self._player_unit) if m not in searched_moves]
+            self.num_generated += len(stage_moves)
+            self._history and stage_moves.sort(key=self._history.__getitem__, reverse=True)
+            PROFILING and profiler.stop("move gen", time_start)
+            yield from stage_moves
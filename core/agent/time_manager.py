@@ -0,0 +1,103 @@
+from time import time
+from config import (
+    AGENT_MAX_SEARCH_SECS, AGENT_TIME_MARGIN_SECS, AGENT_TIME_TARGET_RATIO,
+    AGENT_TIME_EXTENSION_RATIO, AGENT_STABLE_ITERATIONS, AGENT_SCORE_DROP_MARGIN,
+)
+
+
+class TimeManager:
+    """
+    Decides how long an iterative deepening search may run for one move.
+
+    Each move gets a hard limit, which the search must never exceed, and a
+    target, which it normally stops at. With a game clock, the target is the
+    fair share of the remaining clock over the remaining moves; otherwise it
+    is a fraction of the per-move time limit. The target is extended when the
+    best move changes or the score drops, and halved once the best move has
+    held for `AGENT_STABLE_ITERATIONS` iterations. An iteration is only
+    started if it is expected to finish within the hard limit.
+
+    Times are measured from construction.
+    """
+
+    MIN_GROWTH = 2
+    MAX_GROWTH = 8
+
+    def __init__(self, time_limit=AGENT_MAX_SEARCH_SECS, moves_left=None, clock_left=None):
+        self._time_start = time()
+        self._time_limit = time_limit
+        self._hard_limit = max(0, min(time_limit, clock_left if clock_left is not None else time_limit)
+            - AGENT_TIME_MARGIN_SECS)
+        self._target = self._hard_limit * AGENT_TIME_TARGET_RATIO
+        if clock_left is not None:
+            self._target = min(self._target, clock_left / max(moves_left or 1, 1))
+        self._iteration_secs = []
+        self._iteration_end = 0
+        self._best_move = None
+        self._best_score = None
+        self._num_stable_iterations = 0
+
+    @property
+    def time_limit(self):
+        return self._time_limit
+
+    @property
+    def hard_limit(self):
+        return self._hard_limit
+
+    @property
+    def target(self):
+        return self._target
+
+    @property
+    def elapsed(self):
+        return time() - self._time_start
+
+    def out_of_time(self):
+        return self.elapsed >= self._hard_limit
+
+    def record_iteration(self, best_move, best_score):
+        """
+        Records the result of a completed iteration.
+        """
+        elapsed = self.elapsed
+        self._iteration_secs.append(elapsed - self._iteration_end)
+        self._iteration_end = elapsed
+
+        if self._best_move is not None and best_move != self._best_move:
+            self._num_stable_iterations = 0
+            self._extend_target()
+        else:
+            self._num_stable_iterations += 1
+
+        if self._best_score is not None and best_score < self._best_score - AGENT_SCORE_DROP_MARGIN:
+            self._extend_target()
+
+        self._best_move = best_move
+        self._best_score = best_score
+
+    def _extend_target(self):
+        self._target = min(self._target * AGENT_TIME_EXTENSION_RATIO, self._hard_limit)
+
+    def should_start_iteration(self):
+        """
+        Determines if another iteration should be started, given the target
+        and an estimate of how long it would take.
+        """
+        elapsed = self.elapsed
+        target = (self._target / 2
+            if self._num_stable_iterations >= AGENT_STABLE_ITERATIONS
+            else self._target)
+        if elapsed >= target:
+            return False
+
+        if not self._iteration_secs:
+            return True
+
+        # iterations grow roughly by the effective branching factor
+        last_iteration_secs = self._iteration_secs[-1]
+        growth = TimeManager.MAX_GROWTH // 2
+        if len(self._iteration_secs) >= 2 and self._iteration_secs[-2] > 0:
+            growth = min(max(last_iteration_secs / self._iteration_secs[-2],
+                TimeManager.MIN_GROWTH), TimeManager.MAX_GROWTH)
+        return elapsed + last_iteration_secs * growth <= self._hard_limit
@@ -1,13 +1,30 @@
 from __future__ import annotations
 from enum import Enum, auto
 from dataclasses import dataclass
-from core.move import Move
-from core.board import Board
-from core.board_hasher import hash_board
+from struct import Struct
+from multiprocessing.shared_memory import SharedMemory
+from config import AGENT_TABLE_SIZE_MB
 
 
 @dataclass
 class TranspositionTable:
+    """
+    A fixed-capacity transposition table stored in a preallocated buffer.
+
+    Entries live in buckets of two slots: the first slot keeps the deepest
+    entry seen for the bucket, the second is always replaced. Each slot
+    stores the full Zobrist key, so that lookups never return entries for
+    other positions that happen to share a bucket.
+
+    Every search runs under a new generation. Entries that have not been
+    written or hit for `MAX_AGE` generations are stale: they can still be
+    probed, but they lose their claim on the depth-preferred slot.
+
+    The buffer may live in shared memory (see `create_shared` and `attach`)
+    so that several search processes can use one table without locks: each
+    slot stores its key XORed with a checksum of its data, so entries torn
+    by concurrent writes fail verification and read as misses.
+    """
 
     class EntryType(Enum):
         PV = auto()
@@ -18,37 +35,198 @@ class TranspositionTable:
     class Entry:
         score: float
         depth: int
-        move: Move = None
+        move: int = None
         type: TranspositionTable.EntryType = None
 
-    def __init__(self):
-        self._table = {}
-        self._cache_hash = None, None
-
-    def _hash_board(self, board):
-        """
-        Uses the most recently calculated hash if existent.
-        """
-        cached_hash, cached_board = self._cache_hash
-        if board is cached_board:
-            hash = cached_hash
-        else:
-            hash = hash_board(board)
-            self._cache_hash = (hash, board)
-        return hash
-
-    def __contains__(self, hash):
-        # TODO: do we even want to input boards?
-        if type(hash) is Board:
-            hash = self._hash_board(hash)
-        return hash in self._table
-
-    def __getitem__(self, hash):
-        if type(hash) is Board:
-            hash = self._hash_board(hash)
-        return self._table[hash]
-
-    def __setitem__(self, hash, node):
-        if type(hash) is Board:
-            hash = self._hash_board(hash)
-        self._table[hash] = node
+    # key ^ checksum, score, move, depth, type, generation
+    SLOT = Struct("<QdhbBB")
+    BUCKET_SIZE = 2
+    NO_MOVE = -1
+    # the largest depth the signed byte depth field can hold
+    MAX_DEPTH = 127
+    MAX_AGE = 2
+    NUM_GENERATIONS = 256
+    NUM_OCCUPANCY_SAMPLES = 10000
+
+    KEY_MASK = (1 << 64) - 1
+
+    def __init__(self, size_mb=AGENT_TABLE_SIZE_MB, buffer=None):
+        self._size_mb = size_mb
+        self._num_buckets = TranspositionTable._find_num_buckets(size_mb)
+        self._buffer = (buffer
+            if buffer is not None
+            else bytearray(TranspositionTable._find_buffer_size(size_mb)))
+        self._shared_memory = None
+        self._generation = 0
+        self._num_probes = 0
+        self._num_hits = 0
+        self._num_bucket_conflicts = 0
+
+    @staticmethod
+    def _find_num_buckets(size_mb):
+        bucket_size = TranspositionTable.SLOT.size * TranspositionTable.BUCKET_SIZE
+        return max(1, int(size_mb * 1024 * 1024) // bucket_size)
+
+    @staticmethod
+    def _find_buffer_size(size_mb):
+        num_buckets = TranspositionTable._find_num_buckets(size_mb)
+        return num_buckets * TranspositionTable.SLOT.size * TranspositionTable.BUCKET_SIZE
+
+    @classmethod
+    def create_shared(cls, size_mb=AGENT_TABLE_SIZE_MB):
+        """
+        Creates a table whose buffer lives in a new shared memory block.
+        Other processes can open it with `attach(table.shared_name, size_mb)`.
+        """
+        shared_memory = SharedMemory(create=True, size=cls._find_buffer_size(size_mb))
+        table = cls(size_mb, buffer=shared_memory.buf)
+        table._shared_memory = shared_memory
+        return table
+
+    @classmethod
+    def attach(cls, name, size_mb=AGENT_TABLE_SIZE_MB):
+        shared_memory = SharedMemory(name=name)
+        table = cls(size_mb, buffer=shared_memory.buf)
+        table._shared_memory = shared_memory
+        return table
+
+    @property
+    def shared_name(self):
+        return self._shared_memory.name if self._shared_memory else None
+
+    @property
+    def size_mb(self):
+        return self._size_mb
+
+    def close(self, unlink=False):
+        """
+        Releases the shared memory block backing this table, if any.
+        """
+        if not self._shared_memory:
+            return
+        self._buffer = None
+        self._shared_memory.close()
+        if unlink:
+            self._shared_memory.unlink()
+        self._shared_memory = None
+
+    @staticmethod
+    def _find_checksum(score, move, depth, type):
+        return hash((score, move, depth, type)) & TranspositionTable.KEY_MASK
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @generation.setter
+    def generation(self, generation):
+        self._generation = generation % TranspositionTable.NUM_GENERATIONS
+
+    @property
+    def capacity(self):
+        return self._num_buckets * TranspositionTable.BUCKET_SIZE
+
+    @property
+    def occupancy(self):
+        """
+        Estimates the fraction of slots in use from the leading slots of the
+        buffer, so that entries stored by other processes sharing it count.
+        """
+        slot_size = TranspositionTable.SLOT.size
+        num_samples = min(self.capacity, TranspositionTable.NUM_OCCUPANCY_SAMPLES)
+        return sum(bool(self._buffer[i * slot_size + slot_size - 2])
+            for i in range(num_samples)) / num_samples
+
+    @property
+    def num_probes(self):
+        return self._num_probes
+
+    @property
+    def num_hits(self):
+        return self._num_hits
+
+    @property
+    def num_bucket_conflicts(self):
+        """
+        The number of probes that missed on a bucket holding another key.
+        """
+        return self._num_bucket_conflicts
+
+    def _find_bucket(self, hash):
+        return (hash % self._num_buckets) * TranspositionTable.SLOT.size * TranspositionTable.BUCKET_SIZE
+
+    def _find_slot(self, hash):
+        """
+        Finds the offset and contents of the slot holding the given key.
+        Returns None if no slot holds a valid entry for the key.
+        """
+        slot = TranspositionTable.SLOT
+        offset = self._find_bucket(hash)
+        for slot_offset in (offset, offset + slot.size):
+            slot_key, score, move, depth, entry_type, _ = slot.unpack_from(self._buffer, slot_offset)
+            if (entry_type
+            and slot_key ^ TranspositionTable._find_checksum(score, move, depth, entry_type) == hash):
+                return slot_offset, score, move, depth, entry_type
+        return None
+
+    def probe(self, hash):
+        """
+        Looks up the entry for the given key.
+        Returns an `Entry`, or None if the table holds no entry for the key.
+        """
+        self._num_probes += 1
+        slot = self._find_slot(hash)
+        if slot is None:
+            first_type = self._buffer[self._find_bucket(hash) + TranspositionTable.SLOT.size - 2]
+            self._num_bucket_conflicts += bool(first_type)
+            return None
+
+        self._num_hits += 1
+        slot_offset, score, move, depth, entry_type = slot
+        # positions that are still reachable stay fresh
+        self._buffer[slot_offset + TranspositionTable.SLOT.size - 1] = self._generation
+        return TranspositionTable.Entry(
+            score=score,
+            depth=depth,
+            move=move if move != TranspositionTable.NO_MOVE else None,
+            type=TranspositionTable.EntryType(entry_type),
+        )
+
+    def store(self, hash, score, depth, move, type):
+        """
+        Stores an entry for the given key.
+        The depth-preferred slot is replaced by entries for the same key, of
+        at least the same depth, or when it holds a stale entry; anything
+        else goes to the second slot. Depths beyond `MAX_DEPTH` are stored
+        as `MAX_DEPTH`.
+        """
+        slot = TranspositionTable.SLOT
+        buffer = self._buffer
+        offset = self._find_bucket(hash)
+        slot_key, slot_score, slot_move, slot_depth, slot_type, slot_generation = slot.unpack_from(buffer, offset)
+        slot_key ^= TranspositionTable._find_checksum(slot_score, slot_move, slot_depth, slot_type)
+        if (slot_type and slot_key != hash and depth < slot_depth
+        and not self._is_stale(slot_generation)):
+            offset += slot.size
+
+        depth = min(depth, TranspositionTable.MAX_DEPTH)
+        move = move if move is not None else TranspositionTable.NO_MOVE
+        checksum = TranspositionTable._find_checksum(score, move, depth, type.value)
+        slot.pack_into(buffer, offset, hash ^ checksum, score, move, depth, type.value, self._generation)
+
+    def _is_stale(self, generation):
+        age = (self._generation - generation) % TranspositionTable.NUM_GENERATIONS
+        return age >= TranspositionTable.MAX_AGE
+
+    def new_search(self):
+        """
+        Starts a new generation. Entries from the previous search are kept
+        for move ordering and cutoffs, while older ones age out.
+        """
+        self._generation = (self._generation + 1) % TranspositionTable.NUM_GENERATIONS
+
+    def new_game(self):
+        """
+        Marks every entry as stale without paying for a full clear.
+        """
+        self._generation = (self._generation + TranspositionTable.MAX_AGE) % TranspositionTable.NUM_GENERATIONS
@@ -57,7 +57,8 @@ class App:
     def _start_agent_search(self):
         self._agent.start_search(
             board=self.game_board,
-            color=self.PLAYER_MARBLES[self.game_turn]
+            color=self.PLAYER_MARBLES[self.game_turn],
+            time_limit=self._config.time_limits[self.game_turn.value],
         )
 
     def _stop_agent_search(self):
@@ -66,6 +67,8 @@ class App:
     def _new_game(self):
         self.selection = None
         self.game = Game(layout=self._config.starting_layout)
+        self._agent.stop_pondering()
+        self._agent.new_game()
         self._display.clear_board()
         self._display.render(self)
         self._start_time = time()
@@ -75,6 +78,7 @@ class App:
             print("game history is empty")
             return
 
+        self._agent.stop_pondering()
         game = Game(layout=self._config.starting_layout)
         self._game_history.pop()
         for action in self._game_history:
@@ -159,6 +163,7 @@ class App:
         ))
         self.game.perform_move(move)
         self._game_history.append(GameHistoryItem(move))
+        self.game_over and self._agent.stop_pondering()
 
     def _update(self):
         if self._display.is_settings_open:
@@ -175,7 +180,11 @@ class App:
 
         best_move = self._agent.update()
         if best_move:
+            agent_color = self.PLAYER_MARBLES[self.game_turn]
             self._perform_move(best_move)
+            (not self.game_over
+                and self._config.control_modes[self.game_turn.value] == ControlMode.HUMAN
+                and self._agent.start_pondering(self.game_board, agent_color))
 
     def start(self):
         self._display.open(
@@ -206,3 +215,5 @@ class App:
             if self._display.is_animating:
                 self._display.render(self)
             sleep(1 / FPS)
+
+        self._agent.close()
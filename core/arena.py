@@ -0,0 +1,157 @@
+"""
+Headless engine-vs-engine arena.
+
+Plays many `Game`s between two agent configurations across a process pool,
+without the display or its frame loop. Games come in pairs that share a
+layout and a random opening but swap colors, so that neither configuration
+benefits from always moving first. Each side moves either to a fixed
+search depth or under a per-move time limit, and a game is drawn once the
+side to move has used up its own move limit.
+"""
+
+import os
+import sys
+from random import Random
+from time import time
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from core.agent import Agent
+from core.agent.state_generator import generate_moves
+from core.agent.time_manager import TimeManager
+from core.app_config import AppConfig
+from core.bitboard import BitBoard
+from core.board_cell_state import BoardCellState
+from core.game import Game, Player
+from core.packed_move import unpack_move
+from config import (
+    ENABLED_NULL_MOVE_PRUNING, ENABLED_LATE_MOVE_REDUCTIONS, ENABLED_DELTA_PRUNING,
+    AGENT_OPENING_BOOK,
+)
+
+PLAYER_MARBLES = {
+    Player.ONE: BoardCellState.BLACK,
+    Player.TWO: BoardCellState.WHITE,
+}
+
+
+@dataclass
+class ArenaPlayer:
+    """
+    Settings for one side of the arena. Searches to `depth` if given,
+    otherwise for up to `time_limit` seconds per move. The opening book is
+    only consulted by timed searches.
+    """
+
+    depth: int = None
+    time_limit: float = AppConfig.time_limits[0]
+    move_limit: int = AppConfig.move_limits[0]
+    null_move_pruning: bool = ENABLED_NULL_MOVE_PRUNING
+    late_move_reductions: bool = ENABLED_LATE_MOVE_REDUCTIONS
+    delta_pruning: bool = ENABLED_DELTA_PRUNING
+    opening_book_path: str = AGENT_OPENING_BOOK
+
+
+@dataclass
+class GameResult:
+    """
+    Outcome of one arena game. Players are given as indices into the pair
+    of `ArenaPlayer`s, with `players[0]` playing black.
+    """
+
+    index: int
+    layout: str
+    players: tuple
+    winner: int
+    num_plies: int
+    secs: float
+    num_nodes: int
+    search_secs: float
+
+
+def _setup_worker():
+    # games print every move and search, so keep workers quiet
+    sys.stdout = open(os.devnull, "w")
+
+def _find_agent_move(agent, player, game, color):
+    if player.depth is not None:
+        move, _ = agent.search_depth(game.board, color, player.depth)
+        return unpack_move(move) if move is not None else None
+
+    time_manager = TimeManager(time_limit=player.time_limit)
+    move = None
+    for move, _ in agent.gen_best_move(game.board, color, time_manager):
+        pass
+    return move
+
+def play_game(index, layout, players, swapped, num_random_plies, seed):
+    """
+    Plays one game between the given pair of `ArenaPlayer`s, with the second
+    playing black if `swapped`. The game opens with `num_random_plies`
+    random moves drawn from `seed`.
+    Returns a `GameResult`.
+    """
+    time_start = time()
+    game = Game(layout=layout)
+    sides = (1, 0) if swapped else (0, 1)
+    agents = [Agent(
+        num_helpers=0,
+        null_move_pruning=player.null_move_pruning,
+        late_move_reductions=player.late_move_reductions,
+        delta_pruning=player.delta_pruning,
+        opening_book_path=player.opening_book_path,
+    ) for player in players]
+
+    rng = Random(seed)
+    for _ in range(num_random_plies):
+        moves = generate_moves(BitBoard.from_board(game.board), PLAYER_MARBLES[game.turn])
+        if not moves:
+            break
+        game.perform_move(unpack_move(rng.choice(moves)))
+
+    search_secs = 0
+    num_moves = [0, 0]
+    while not game.over:
+        side = sides[game.turn.value]
+        if num_moves[side] >= players[side].move_limit:
+            break
+        search_start = time()
+        move = _find_agent_move(agents[side], players[side], game, PLAYER_MARBLES[game.turn])
+        search_secs += time() - search_start
+        if move is None:
+            break
+        game.perform_move(move)
+        num_moves[side] += 1
+
+    for agent in agents:
+        agent.close()
+
+    return GameResult(
+        index=index,
+        layout=layout.name,
+        players=sides,
+        winner=sides[game.winner.value] if game.winner else None,
+        num_plies=game.ply,
+        secs=time() - time_start,
+        num_nodes=sum(agent.num_nodes for agent in agents),
+        search_secs=search_secs,
+    )
+
+def run_arena(players, layouts, num_games, num_random_plies=2, seed=0, max_workers=None):
+    """
+    Plays `num_games` games between the given pair of `ArenaPlayer`s across
+    a process pool, cycling through the given layouts and swapping colors
+    between the games of each pair.
+    Yields each `GameResult` as its game finishes.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers,
+            mp_context=get_context("spawn"), initializer=_setup_worker) as executor:
+        futures = []
+        for index in range(num_games):
+            layout = layouts[index // 2 % len(layouts)]
+            futures.append(executor.submit(play_game, index, layout, players,
+                swapped=bool(index % 2),
+                num_random_plies=num_random_plies,
+                seed=seed + index // 2))
+        for future in as_completed(futures):
+            yield future.result()
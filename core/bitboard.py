@@ -0,0 +1,167 @@
+from core.board_cell_state import BoardCellState
+from core.cells import CELLS, CELL_INDICES, NUM_CELLS, NEIGHBORS
+from config import BOARD_SIZE
+
+CELL_BITS = tuple(1 << i for i in range(NUM_CELLS))
+FULL_MASK = (1 << NUM_CELLS) - 1
+
+# NEIGHBOR_MASKS[i]: mask of the on-board neighbors of cell i
+NEIGHBOR_MASKS = tuple(sum(CELL_BITS[n] for n in NEIGHBORS[i] if n is not None)
+    for i in range(NUM_CELLS))
+
+def iterate_bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+class BitBoard:
+    """
+    A board representation that stores each color as an integer mask over
+    the fixed cell numbering in `CELLS`.
+    Exposes the same interface as `Board`, so the two can be used
+    interchangeably by game logic; copies only need to carry two ints.
+    """
+
+    def __init__(self, layout=None, black=0, white=0):
+        self._layout = layout
+        self._black = black
+        self._white = white
+        self._occupied = black | white
+        self.__items = None
+        self.__items_key = None
+        self.__items_nonempty = None
+        self.__items_nonempty_key = None
+
+    @classmethod
+    def from_board(cls, board):
+        bitboard = cls(layout=board.layout)
+        bitboard.mimic(board)
+        return bitboard
+
+    def __repr__(self):
+        STATE_MAP = {
+            1: "b",
+            2: "w",
+        }
+        pieces = [str(cell) + STATE_MAP[cell_state.value]
+            for cell, cell_state in self.enumerate()
+                if cell_state != BoardCellState.EMPTY]
+        pieces.sort(key=lambda piece: ord(piece[-1]) * 26 + ord(piece[0]) - 65)
+        return ",".join(pieces)
+
+    def __copy__(self):
+        return BitBoard(layout=self._layout, black=self._black, white=self._white)
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    copy = __copy__
+
+    @property
+    def layout(self):
+        return self._layout
+
+    @property
+    def black(self):
+        return self._black
+
+    @property
+    def white(self):
+        return self._white
+
+    @property
+    def occupied(self):
+        return self._occupied
+
+    def mask(self, cell_state):
+        if cell_state == BoardCellState.BLACK:
+            return self._black
+        elif cell_state == BoardCellState.WHITE:
+            return self._white
+        else:
+            return FULL_MASK ^ self._occupied
+
+    def offset(self, r):
+        return (self.height // 2 - r) * (r <= self.height // 2)
+
+    def width(self, r):
+        return (self.height - abs(r - self.height // 2)
+            if r >= 0 and r < self.height
+            else None)
+
+    @property
+    def height(self):
+        return BOARD_SIZE * 2 - 1
+
+    def __contains__(self, cell):
+        return cell in CELL_INDICES
+
+    def __getitem__(self, cell):
+        index = CELL_INDICES.get(cell)
+        if index is None:
+            return None
+        return self.get_index(index)
+
+    def __setitem__(self, cell, data):
+        index = CELL_INDICES.get(cell)
+        if index is not None:
+            self.set_index(index, data)
+
+    def get_index(self, index):
+        bit = CELL_BITS[index]
+        if not self._occupied & bit:
+            return BoardCellState.EMPTY
+        elif self._black & bit:
+            return BoardCellState.BLACK
+        else:
+            return BoardCellState.WHITE
+
+    def set_index(self, index, data):
+        bit = CELL_BITS[index]
+        black = self._black & ~bit
+        white = self._white & ~bit
+        if data == BoardCellState.BLACK:
+            black |= bit
+        elif data == BoardCellState.WHITE:
+            white |= bit
+        self._black = black
+        self._white = white
+        self._occupied = black | white
+
+    def enumerate(self):
+        items_key = (self._black, self._white)
+        if self.__items_key != items_key:
+            self.__items = [(cell, self.get_index(i)) for i, cell in enumerate(CELLS)]
+            self.__items_key = items_key
+        return self.__items
+
+    def enumerate_nonempty(self):
+        items_key = (self._black, self._white)
+        if self.__items_nonempty_key != items_key:
+            self.__items_nonempty = [(CELLS[i], self.get_index(i)) for i in iterate_bits(self._occupied)]
+            self.__items_nonempty_key = items_key
+        return self.__items_nonempty
+
+    def fill(self, data):
+        self._black = FULL_MASK if data == BoardCellState.BLACK else 0
+        self._white = FULL_MASK if data == BoardCellState.WHITE else 0
+        self._occupied = self._black | self._white
+
+    def mimic(self, board):
+        if isinstance(board, BitBoard):
+            self._black = board._black
+            self._white = board._white
+            self._occupied = board._occupied
+            return
+
+        black = 0
+        white = 0
+        for cell, cell_state in board.enumerate_nonempty():
+            if cell_state == BoardCellState.BLACK:
+                black |= CELL_BITS[CELL_INDICES[cell]]
+            elif cell_state == BoardCellState.WHITE:
+                white |= CELL_BITS[CELL_INDICES[cell]]
+        self._black = black
+        self._white = white
+        self._occupied = black | white
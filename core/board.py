@@ -1,4 +1,4 @@
-from core.hex import Hex
+from core.cells import CELLS
 from core.board_cell_state import BoardCellState
 from config import BOARD_SIZE
 
@@ -66,28 +66,22 @@ class Board:
             self.__items = None
             self.__items_nonempty = None
 
+    def get_index(self, index):
+        return self[CELLS[index]]
+
+    def set_index(self, index, data):
+        self[CELLS[index]] = data
+
     def enumerate(self):
         if not self.__items:
-            items = []
-            for r, line in enumerate(self._data):
-                for q, val in enumerate(line):
-                    q += self.offset(r)
-                    item = (Hex(q, r), val)
-                    items.append(item)
-            self.__items = items
+            values = (val for line in self._data for val in line)
+            self.__items = list(zip(CELLS, values))
         return self.__items
 
     def enumerate_nonempty(self):
         if not self.__items_nonempty:
-            items = []
-            for r, line in enumerate(self._data):
-                for q, val in enumerate(line):
-                    if val == BoardCellState.EMPTY:
-                        continue
-                    q += self.offset(r)
-                    item = (Hex(q, r), val)
-                    items.append(item)
-            self.__items_nonempty = items
+            self.__items_nonempty = [item for item in self.enumerate()
+                if item[1] != BoardCellState.EMPTY]
         return self.__items_nonempty
 
     def fill(self, data):
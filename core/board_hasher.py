@@ -1,74 +1,65 @@
-from random import getrandbits
-from core.board import Board
+from random import Random
+from core.cells import CELL_INDICES, NUM_CELLS
 from core.board_cell_state import BoardCellState
-from core.hex import Hex
 
 
-def setup_cell_indices():
-    cell_indices = {}
-    temp_board = Board()
-    for i, (cell, _) in enumerate(temp_board.enumerate()):
-        cell_indices[cell] = i
-    return cell_indices
+class HashMismatch(Exception):
+    pass
 
-CELL_INDICES = setup_cell_indices()
 
-
-def setup_zobrist(bits):
-    zobrist_table = {}
-    for i in range(2):
-        piece_index = i + 1
-        for _, cell_index in CELL_INDICES.items():
-            zobrist_table[cell_index * piece_index] = getrandbits(bits)
-    return zobrist_table
+def setup_zobrist(bits, seed):
+    """
+    Generates one key per (cell state, cell) pair from a fixed seed, so that
+    hashes agree across processes and runs.
+    Keys for empty cells are zero.
+    """
+    rng = Random(seed)
+    zobrist_table = []
+    for cell_state in BoardCellState:
+        if cell_state == BoardCellState.EMPTY:
+            zobrist_table.append((0,) * NUM_CELLS)
+        else:
+            zobrist_table.append(tuple(rng.getrandbits(bits) for _ in range(NUM_CELLS)))
+    return tuple(zobrist_table), rng.getrandbits(bits)
 
 ZOBRIST_BITS = 64
-ZOBRIST = setup_zobrist(bits=ZOBRIST_BITS)
+ZOBRIST_SEED = 0xABA10E
+ZOBRIST, ZOBRIST_TURN = setup_zobrist(bits=ZOBRIST_BITS, seed=ZOBRIST_SEED)
 
 
 def get_piece_mask(cell, cell_state):
-    return ZOBRIST[hash_piece(cell, cell_state)]
-
-def hash_piece(cell, cell_state):
-    return CELL_INDICES[cell] * cell_state.value
+    return ZOBRIST[cell_state.value][CELL_INDICES[cell]]
 
-def hash_board(board):
+def hash_board(board, turn=None):
+    """
+    Hashes the given board. The side-to-move key is included if `turn` is
+    white, so that the same position with a different player to move
+    hashes differently.
+    """
     hash = 0
-    for cell, cell_state in board.enumerate():
-        if cell_state != BoardCellState.EMPTY:
-            hash ^= get_piece_mask(cell, cell_state)
+    for cell, cell_state in board.enumerate_nonempty():
+        hash ^= get_piece_mask(cell, cell_state)
+    if turn == BoardCellState.WHITE:
+        hash ^= ZOBRIST_TURN
     return hash
 
-def update_hash(hash, board, move):
+def verify_hash(hash, board, turn):
     """
-    Updates a Zobrist hash with the given move.
-    Foregoes move validation in favor of speed.
+    Compares an incrementally updated hash against a full rehash of the
+    board. Used when `ENABLED_HASH_VERIFICATION` is set.
     """
+    expected_hash = hash_board(board, turn)
+    if hash != expected_hash:
+        raise HashMismatch(f"expected hash {expected_hash:016x} but got {hash:016x} for {board}")
 
-    move_tail = move.tail()
-    move_cells = move.pieces()
-    move_targets = move.targets()
-    attacker_color = board[move_tail]
-
-    for cell in move_cells:
-        hash ^= get_piece_mask(cell, attacker_color)
-
-    for target in move_targets:
-        hash ^= get_piece_mask(target, attacker_color)
-
-    move_dest = move.target_cell()
-    defender_color = board[move_dest]
-
-    if defender_color != BoardCellState.EMPTY and move.is_inline():
-        hash ^= get_piece_mask(move_dest, defender_color)
-
-        push_dest = move_dest
-        push_content = defender_color
-        while push_content not in (None, BoardCellState.EMPTY):
-            push_dest = Hex.add(push_dest, move.direction.value)
-            push_content = board[push_dest]
+def update_hash_from_record(hash, board, record):
+    """
+    Updates a Zobrist hash with the undo record of a move that has already
+    been applied to the given board.
+    """
 
-        if push_content is not None:
-            hash ^= get_piece_mask(push_dest, defender_color)
+    for cell_index, cell_state in zip(record.cells, record.states):
+        hash ^= ZOBRIST[cell_state.value][cell_index]
+        hash ^= ZOBRIST[board.get_index(cell_index).value][cell_index]
 
-    return hash
+    return hash ^ ZOBRIST_TURN
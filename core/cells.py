@@ -0,0 +1,62 @@
+"""
+Registry of on-board cells.
+
+Every cell on the board is created exactly once and assigned a dense index
+in row-major order. Geometry that the engine needs on every node (neighbors,
+rays to the edge of the board and distances to the center) is precomputed
+here, so that hot paths can look cells up instead of doing coordinate
+arithmetic.
+"""
+
+from core.hex import Hex, HexDirection
+from config import BOARD_SIZE
+
+BOARD_RADIUS = BOARD_SIZE - 1
+BOARD_CENTER = Hex(BOARD_RADIUS, BOARD_RADIUS)
+
+DIRECTIONS = tuple(HexDirection)
+DIRECTION_INDICES = {direction: i for i, direction in enumerate(DIRECTIONS)}
+OPPOSITE_DIRECTIONS = tuple(DIRECTION_INDICES[HexDirection.resolve(Hex.invert(d.value))]
+    for d in DIRECTIONS)
+
+
+def generate_cells(size):
+    cells = []
+    radius = size - 1
+    for r in range(size * 2 - 1):
+        for q in range(max(0, radius - r), min(size * 2 - 1, radius * 3 - r + 1)):
+            cells.append(Hex(q, r))
+    return tuple(cells)
+
+CELLS = generate_cells(size=BOARD_SIZE)
+CELL_INDICES = {cell: i for i, cell in enumerate(CELLS)}
+NUM_CELLS = len(CELLS)
+
+
+def _find_neighbor_index(index, direction):
+    return CELL_INDICES.get(Hex.add(CELLS[index], direction.value))
+
+def _find_ray(index, direction):
+    ray = []
+    index = _find_neighbor_index(index, direction)
+    while index is not None:
+        ray.append(index)
+        index = _find_neighbor_index(index, direction)
+    return tuple(ray)
+
+# NEIGHBORS[i][d]: index of the neighbor of cell i in direction d, or None
+NEIGHBORS = tuple(tuple(_find_neighbor_index(i, d) for d in DIRECTIONS)
+    for i in range(NUM_CELLS))
+
+# RAYS[i][d]: indices of the cells from cell i (exclusive) to the board edge
+RAYS = tuple(tuple(_find_ray(i, d) for d in DIRECTIONS)
+    for i in range(NUM_CELLS))
+
+# CENTER_DISTANCES[i]: manhattan distance from cell i to the board center
+CENTER_DISTANCES = tuple(int(Hex.manhattan(cell, BOARD_CENTER)) for cell in CELLS)
+
+# cell-keyed views of the tables above for code that works with `Hex`
+CELL_NEIGHBORS = {cell: tuple(CELLS[n] for n in NEIGHBORS[i] if n is not None)
+    for i, cell in enumerate(CELLS)}
+CELL_RAYS = {cell: {d: tuple(CELLS[r] for r in RAYS[i][j]) for j, d in enumerate(DIRECTIONS)}
+    for i, cell in enumerate(CELLS)}
@@ -1,35 +1,81 @@
 from math import inf
 from enum import Enum
+from dataclasses import dataclass
 from core.board_cell_state import BoardCellState
 from core.board_layout import BoardLayout
-from core.hex import Hex
+from core.cells import CELL_RAYS, RAYS
+from core.packed_move import (
+    pack_move,
+    MOVE_PIECES, MOVE_TARGETS, MOVE_CELLS, MOVE_HEADS, MOVE_TARGET_CELLS, MOVE_DIRECTIONS,
+)
 from config import NUM_EJECTED_MARBLES_TO_WIN
 
+@dataclass
+class MoveRecord:
+    """
+    Describes the cells overwritten by `apply_move` so that the move can be
+    reverted in place with `undo_move`. Cells are given as registry indices.
+    """
+
+    cells: tuple
+    states: tuple
+    ejected: BoardCellState = None
+
 def apply_move(board, move, validate=False):
+    """
+    Applies a `Move` or a packed move to the given board.
+    Returns a `MoveRecord` describing the change, or None if the move is
+    rejected.
+    """
+
     if validate and not is_move_legal(board, move):
-        return
+        return None
 
-    unit = board[move.head()]
+    code = move if type(move) is int else pack_move(move)
+    if code is None:
+        return None
 
-    for cell in move.pieces():
-        board[cell] = BoardCellState.EMPTY
+    move_pieces = MOVE_PIECES[code]
+    move_targets = MOVE_TARGETS[code]
+    changed_cells = MOVE_CELLS[code]
+    unit = board.get_index(MOVE_HEADS[code])
 
     # attempt sumito
-    defender_cell = move.target_cell()
-    defender_unit = board[defender_cell]
-    if defender_unit not in (BoardCellState.EMPTY, unit):
-        num_defenders = count_marbles_in_line(board, defender_cell, move.direction)
-        for _ in range(num_defenders):
-            defender_cell = Hex.add(defender_cell, move.direction.value)
-            if defender_cell not in board:
-                break
-            board[defender_cell] = defender_unit
-
-    move_targets = move.targets()
+    push_cell = None
+    ejected_unit = None
+    defender_cell = MOVE_TARGET_CELLS[code]
+    defender_unit = (board.get_index(defender_cell)
+        if defender_cell is not None
+        else None)
+    if defender_unit not in (None, BoardCellState.EMPTY, unit):
+        push_cell = next((c for c in RAYS[defender_cell][MOVE_DIRECTIONS[code]]
+            if board.get_index(c) != defender_unit), None)
+        if push_cell is not None:
+            changed_cells += (push_cell,)
+        else:
+            ejected_unit = defender_unit
+
+    record = MoveRecord(
+        cells=changed_cells,
+        states=tuple(board.get_index(c) for c in changed_cells),
+        ejected=ejected_unit,
+    )
+
+    for cell in move_pieces:
+        board.set_index(cell, BoardCellState.EMPTY)
+
+    if push_cell is not None:
+        board.set_index(push_cell, defender_unit)
+
     for cell in move_targets:
-        board[cell] = unit
+        if cell is not None:
+            board.set_index(cell, unit)
+
+    return record
 
-    return board
+def undo_move(board, record):
+    for cell, cell_state in zip(record.cells, record.states):
+        board.set_index(cell, cell_state)
 
 def is_move_legal(board, move):
     if is_move_target_empty(board, move):
@@ -62,12 +108,14 @@ def count_marbles_in_line(board, cell, direction):
 def find_marbles_in_line(board, cell, direction):
     marbles = []
     unit = board[cell]
-    if unit == BoardCellState.EMPTY:
+    if unit in (None, BoardCellState.EMPTY):
         return marbles
 
-    while board[cell] not in (None, BoardCellState.EMPTY):
+    marbles.append(cell)
+    for cell in CELL_RAYS[cell][direction]:
+        if board[cell] == BoardCellState.EMPTY:
+            break
         marbles.append(cell)
-        cell = Hex.add(cell, direction.value)
 
     return marbles
 
@@ -18,10 +18,22 @@ class Move:
             *([self.direction.name] if self.direction else []),
         ))
 
+    def __eq__(self, other):
+        return isinstance(other, Move) and self._key() == other._key()
+
     def __hash__(self):
-        return (hash(self.start)
-             + hash(self.end) * pow(BOARD_MAXCOLS, 2)
-             + list(HexDirection).index(self.direction) * pow(BOARD_MAXCOLS, 3))
+        start, end, direction = self._key()
+        return (start
+             + end * pow(BOARD_MAXCOLS, 2)
+             + list(HexDirection).index(direction) * pow(BOARD_MAXCOLS, 3))
+
+    def _key(self):
+        """
+        Identifies a move regardless of the order its ends were selected in.
+        """
+        start = hash(self.start)
+        end = hash(self.end or self.start)
+        return min(start, end), max(start, end), self.direction
 
     @property
     def start(self):
@@ -49,7 +61,7 @@ class Move:
             return self.start
 
         disp = Hex.subtract(self.end, self.start)
-        normal = Hex(disp.x / (abs(disp.x) or 1), disp.y / (abs(disp.y) or 1))
+        normal = Hex((disp.x > 0) - (disp.x < 0), (disp.y > 0) - (disp.y < 0))
         if self.direction.value == normal:
             return self.end
         else:
@@ -63,7 +75,7 @@ class Move:
             return self.start
 
         disp = Hex.subtract(self.end, self.start)
-        normal = Hex(disp.x / (abs(disp.x) or 1), disp.y / (abs(disp.y) or 1))
+        normal = Hex((disp.x > 0) - (disp.x < 0), (disp.y > 0) - (disp.y < 0))
         if self.direction.value == normal:
             return self.start
         else:
@@ -0,0 +1,47 @@
+"""
+Reads positions in the course's `.input` notation: the side to move (`b` or
+`w`) followed by a comma-separated list of marbles such as `C5b`, each
+giving a row letter (A at the bottom), a diagonal number and a color.
+"""
+
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.hex import Hex
+
+MAP_COLOR = {
+  "b": BoardCellState.BLACK,
+  "w": BoardCellState.WHITE,
+}
+
+
+class NotationError(Exception):
+    pass
+
+
+def convert_cell_to_hex(cell):
+    col = int(cell[1]) - 1
+    row = 9 - (ord(cell[0]) - 65) - 1
+    return Hex(col, row)
+
+def parse_position(buffer):
+    """
+    Parses a position from the contents of an `.input` file, or from the
+    same two fields separated by any whitespace.
+    Returns the board and the side to move.
+    """
+    fields = buffer.split()
+    if len(fields) != 2 or fields[0] not in MAP_COLOR:
+        raise NotationError(f"expected a side to move and a list of marbles, got {buffer!r}")
+    turn_field, pieces_field = fields
+
+    board = BoardLayout.setup_board(BoardLayout.STANDARD)
+    board.fill(BoardCellState.EMPTY)
+    for piece_str in pieces_field.split(","):
+        if len(piece_str) != 3 or piece_str[-1] not in MAP_COLOR or not piece_str[1].isdigit():
+            raise NotationError(f"invalid marble {piece_str!r}")
+        piece_cell = convert_cell_to_hex(piece_str[0:2])
+        if piece_cell not in board:
+            raise NotationError(f"marble {piece_str!r} is off the board")
+        board[piece_cell] = MAP_COLOR[piece_str[-1]]
+
+    return board, MAP_COLOR[turn_field]
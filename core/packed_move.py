@@ -0,0 +1,114 @@
+"""
+Packed integer move encoding for the search.
+
+A move is encoded as `(start * NUM_CELLS + end) * NUM_DIRECTIONS + direction`,
+where `start` and `end` are registry indices of the ends of the selection
+(ordered so that `start <= end`) and `direction` is an index into
+`DIRECTIONS`. Packed moves compare and hash by value, and their geometry is
+looked up in the tables below instead of being recomputed.
+"""
+
+from core.cells import CELLS, CELL_INDICES, NUM_CELLS, DIRECTIONS, DIRECTION_INDICES, NEIGHBORS, RAYS
+from core.move import Move
+from config import MAX_MOVABLE_MARBLES
+
+NUM_DIRECTIONS = len(DIRECTIONS)
+NUM_MOVE_CODES = NUM_CELLS * NUM_CELLS * NUM_DIRECTIONS
+
+
+def encode_move(start, end, direction):
+    if end < start:
+        start, end = end, start
+    return (start * NUM_CELLS + end) * NUM_DIRECTIONS + direction
+
+def decode_move(code):
+    code, direction = divmod(code, NUM_DIRECTIONS)
+    start, end = divmod(code, NUM_CELLS)
+    return start, end, direction
+
+def _find_selection(start, end):
+    if start == end:
+        return (start,)
+    for ray in RAYS[start]:
+        ray = ray[:MAX_MOVABLE_MARBLES - 1]
+        if end in ray:
+            return (start, *ray[:ray.index(end) + 1])
+    return None
+
+def _setup_move_tables():
+    tables = {
+        "pieces": [None] * NUM_MOVE_CODES,
+        "targets": [None] * NUM_MOVE_CODES,
+        "heads": [None] * NUM_MOVE_CODES,
+        "target_cells": [None] * NUM_MOVE_CODES,
+        "cells": [None] * NUM_MOVE_CODES,
+        "inline": [False] * NUM_MOVE_CODES,
+    }
+
+    for start in range(NUM_CELLS):
+        for end in range(start, NUM_CELLS):
+            pieces = _find_selection(start, end)
+            if pieces is None:
+                continue
+
+            for direction in range(NUM_DIRECTIONS):
+                code = encode_move(start, end, direction)
+                if len(pieces) == 1:
+                    head = start
+                    is_inline = False
+                elif NEIGHBORS[start][direction] == pieces[1]:
+                    head = end
+                    is_inline = True
+                elif NEIGHBORS[end][direction] == pieces[-2]:
+                    head = start
+                    is_inline = True
+                else:
+                    head = start
+                    is_inline = False
+
+                targets = tuple(NEIGHBORS[p][direction] for p in pieces)
+                tables["pieces"][code] = pieces
+                tables["targets"][code] = targets
+                tables["cells"][code] = (*pieces, *(t for t in targets
+                    if t is not None and t not in pieces))
+                tables["heads"][code] = head
+                tables["target_cells"][code] = NEIGHBORS[head][direction]
+                tables["inline"][code] = is_inline
+
+    return tables
+
+_MOVE_TABLES = _setup_move_tables()
+
+# indexed by move code; None for codes that do not describe a selection.
+# MOVE_CELLS holds the pieces followed by the on-board targets they move onto.
+MOVE_PIECES = tuple(_MOVE_TABLES["pieces"])
+MOVE_TARGETS = tuple(_MOVE_TABLES["targets"])
+MOVE_HEADS = tuple(_MOVE_TABLES["heads"])
+MOVE_TARGET_CELLS = tuple(_MOVE_TABLES["target_cells"])
+MOVE_CELLS = tuple(_MOVE_TABLES["cells"])
+MOVE_INLINE = tuple(_MOVE_TABLES["inline"])
+MOVE_DIRECTIONS = tuple(code % NUM_DIRECTIONS for code in range(NUM_MOVE_CODES))
+
+
+def pack_move(move):
+    """
+    Converts a `Move` into its packed representation.
+    Returns None if the move does not describe a valid selection.
+    """
+    start = CELL_INDICES.get(move.start)
+    end = CELL_INDICES.get(move.end or move.start)
+    if start is None or end is None or move.direction is None:
+        return None
+
+    code = encode_move(start, end, DIRECTION_INDICES[move.direction])
+    if MOVE_PIECES[code] is None:
+        return None
+
+    return code
+
+def unpack_move(code):
+    """
+    Converts a packed move back into a `Move`, e.g. for display purposes.
+    """
+    start, end, direction = decode_move(code)
+    return Move(CELLS[start], CELLS[end], DIRECTIONS[direction])
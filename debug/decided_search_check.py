@@ -0,0 +1,76 @@
+"""
+Checks that searches on decided positions (one side can force a win)
+stop on their own once the win is proven, both with a time manager and
+without one as when pondering, instead of deepening until they run out of
+time or depth.
+
+Positions are reached by seeded random playouts from each layout, taking
+those where one side is a marble away from losing.
+
+Usage: python -m debug.decided_search_check [num_positions] [seed]
+"""
+
+import sys
+from random import Random
+from threading import Timer
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.game import apply_move
+from core.agent import Agent, WIN_THRESHOLD, MAX_DEPTH, MIN_MARBLES
+from core.agent.state_generator import generate_moves, generate_sumitos
+from core.agent.time_manager import TimeManager
+
+MAX_PLIES = 400
+TIME_LIMIT = 5
+
+
+def find_decided_positions(num_positions, seed):
+    rng = Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        for layout in (BoardLayout.STANDARD, BoardLayout.GERMAN_DAISY, BoardLayout.BELGIAN_DAISY):
+            board = BitBoard.from_board(BoardLayout.setup_board(layout))
+            color = BoardCellState.BLACK
+            for _ in range(MAX_PLIES):
+                enemy_unit = BoardCellState.next(color)
+                ejections, pushes = generate_sumitos(board, color)
+                if ejections and board.mask(enemy_unit).bit_count() == MIN_MARBLES + 1:
+                    positions.append((board.copy(), color))
+                    break
+                moves = generate_moves(board, color)
+                # favor sumitos so that playouts reach decided positions
+                apply_move(board, rng.choice(ejections or pushes or moves)
+                    if rng.random() < 0.7
+                    else rng.choice(moves))
+                color = enemy_unit
+    return positions[:num_positions]
+
+def check_search(board, color, time_manager):
+    agent = Agent(num_helpers=0, opening_book_path=None)
+    # only a runaway search should still be going when this fires
+    timer = Timer(TIME_LIMIT * 2, agent.interrupt)
+    timer.start()
+    try:
+        for _ in agent.gen_best_move(board, color, time_manager):
+            pass
+    finally:
+        timer.cancel()
+        agent.close()
+
+    stats = agent._stats
+    if stats.best_score is None or stats.best_score < WIN_THRESHOLD:
+        raise AssertionError(f"no win found on {board} (stats: {stats})")
+    if stats.depth > MAX_DEPTH or len(stats.iteration_secs) != stats.depth:
+        raise AssertionError(f"search did not stop once decided on {board} (stats: {stats})")
+    return stats
+
+if __name__ == "__main__":
+    num_positions = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    for board, color in find_decided_positions(num_positions, seed):
+        timed_stats = check_search(board, color, TimeManager(TIME_LIMIT))
+        untimed_stats = check_search(board, color, None)
+        print(f"{board}: {timed_stats.best_move} ({timed_stats.best_score}),"
+            f" timed depth {timed_stats.depth} in {timed_stats.secs:.2f}s,"
+            f" untimed depth {untimed_stats.depth} in {untimed_stats.secs:.2f}s")
@@ -0,0 +1,67 @@
+"""
+Cross-checks `IncrementalHeuristic` against a full evaluation with
+`_heuristic_optimized` on random playouts from each layout, after every
+update as the playout goes and after every revert as it is unwound.
+
+Usage: python -m debug.heuristic_check [num_games] [seed]
+"""
+
+import sys
+from random import Random
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.game import apply_move, undo_move
+from core.packed_move import MOVE_TARGET_CELLS
+from core.agent.heuristic import IncrementalHeuristic, _heuristic_optimized
+from core.agent.state_generator import generate_moves
+
+NUM_PLIES = 100
+
+
+def check_position(board, evaluator, action):
+    for color in (BoardCellState.BLACK, BoardCellState.WHITE):
+        expected_score = _heuristic_optimized(board, color)
+        actual_score = evaluator.evaluate(color)
+        if actual_score != expected_score:
+            raise AssertionError(f"score mismatch for {color} after {action} on {board}:"
+                f" expected {expected_score}, got {actual_score}")
+        if evaluator.count_marbles(color) != board.mask(color).bit_count():
+            raise AssertionError(f"marble count mismatch for {color} after {action} on {board}")
+
+def check_playouts(num_games, seed=0):
+    rng = Random(seed)
+    num_updates = 0
+    for layout in (BoardLayout.STANDARD, BoardLayout.GERMAN_DAISY, BoardLayout.BELGIAN_DAISY):
+        for _ in range(num_games):
+            board = BitBoard.from_board(BoardLayout.setup_board(layout))
+            evaluator = IncrementalHeuristic(board)
+            check_position(board, evaluator, "setup")
+            player_unit = BoardCellState.BLACK
+            move_records = []
+            for _ in range(NUM_PLIES):
+                moves = generate_moves(board, player_unit)
+                if not moves:
+                    break
+
+                # favour sumitos so that playouts reach ejections
+                enemy_unit = BoardCellState.next(player_unit)
+                pushes = [m for m in moves if board.get_index(MOVE_TARGET_CELLS[m]) == enemy_unit]
+                move_record = apply_move(board, rng.choice(pushes if pushes and rng.random() < 0.8 else moves))
+                evaluator.update(move_record)
+                check_position(board, evaluator, "update")
+                move_records.append(move_record)
+                num_updates += 1
+                player_unit = enemy_unit
+
+            for move_record in reversed(move_records):
+                undo_move(board, move_record)
+                evaluator.revert()
+                check_position(board, evaluator, "revert")
+    return num_updates
+
+if __name__ == "__main__":
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    num_updates = check_playouts(num_games, seed)
+    print(f"checked {num_updates} updates and reverts")
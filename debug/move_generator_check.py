@@ -0,0 +1,116 @@
+"""
+Cross-checks `generate_moves` and `StagedMoveGenerator` against the original
+selection-shape move generator on positions reached by random playouts from
+each layout.
+
+Usage: python -m debug.move_generator_check [num_games] [seed]
+"""
+
+import sys
+from random import Random
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.cells import CELL_RAYS
+from core.hex import HexDirection
+from core.move import Move
+from core.game import apply_move, is_move_legal
+from core.packed_move import pack_move, MOVE_PIECES, MOVE_TARGET_CELLS
+from core.agent.state_generator import StagedMoveGenerator, generate_moves
+
+NUM_PLIES = 100
+
+
+def enumerate_player_moves_by_shape(board, player_unit):
+    player_moves = []
+    selection_shapes = _enumerate_selection_shapes(board, player_unit)
+    for selection_shape in selection_shapes:
+        selection_shape = tuple(selection_shape)
+        if len(selection_shape) == 1:
+            start = end = selection_shape[0]
+        else:
+            start, end = selection_shape
+        for direction in HexDirection:
+            move = Move(start, end, direction)
+            if is_move_legal(board, move):
+                player_moves.append(move)
+    return player_moves
+
+def _enumerate_selection_shapes(board, player_unit):
+    selection_shapes = []
+    for cell, color in board.enumerate():
+        if color is not player_unit:
+            continue
+        cell_selection_shapes = _enumerate_cell_selection_shapes(board, cell)
+        selection_shapes += [shape for shape in cell_selection_shapes if shape not in selection_shapes]
+    return selection_shapes
+
+def _enumerate_cell_selection_shapes(board, origin):
+    selection_shapes = [{origin, origin}]
+    for direction in HexDirection:
+        origin_color = board[origin]
+        shape = [origin]
+        for cell in CELL_RAYS[origin][direction][:2]:
+            if board[cell] != origin_color:
+                break
+            shape.append(cell)
+            selection_shapes.append({shape[0], shape[-1]})
+
+    return selection_shapes
+
+
+def check_position(board, player_unit):
+    expected_moves = sorted(pack_move(m) for m in enumerate_player_moves_by_shape(board, player_unit))
+    actual_moves = sorted(generate_moves(board, player_unit))
+    if actual_moves != expected_moves:
+        raise AssertionError(f"move mismatch for {player_unit} on {board}:"
+            f" missing {set(expected_moves) - set(actual_moves)},"
+            f" unexpected {set(actual_moves) - set(expected_moves)}")
+    if len(set(actual_moves)) != len(actual_moves):
+        raise AssertionError(f"duplicate moves for {player_unit} on {board}")
+    hash_move = actual_moves[-1] if actual_moves else None
+    staged_moves = sorted(StagedMoveGenerator(board, player_unit, hash_move=hash_move))
+    if staged_moves != actual_moves:
+        raise AssertionError(f"staged move mismatch for {player_unit} on {board}")
+
+    # refutations may be illegal or duplicate other stages, e.g. killers
+    # taken from sibling positions
+    enemy_moves = generate_moves(board, BoardCellState.next(player_unit))
+    refutations = (*actual_moves[len(actual_moves) // 2:][:1], *enemy_moves[:2], hash_move)
+    history = [code % 7 for code in range(len(MOVE_PIECES))]
+    move_generator = StagedMoveGenerator(board, player_unit, hash_move=hash_move,
+        refutations=tuple(m for m in refutations if m is not None), history=history)
+    staged_moves = sorted(move_generator)
+    if staged_moves != actual_moves or move_generator.num_generated != len(actual_moves):
+        raise AssertionError(f"ordered staged move mismatch for {player_unit} on {board}")
+    return len(actual_moves)
+
+def check_playouts(num_games, seed=0):
+    rng = Random(seed)
+    num_positions = 0
+    num_moves = 0
+    for layout in (BoardLayout.STANDARD, BoardLayout.GERMAN_DAISY, BoardLayout.BELGIAN_DAISY):
+        for _ in range(num_games):
+            board = BitBoard.from_board(BoardLayout.setup_board(layout))
+            player_unit = BoardCellState.BLACK
+            for _ in range(NUM_PLIES):
+                for unit in (player_unit, BoardCellState.next(player_unit)):
+                    num_moves += check_position(board, unit)
+                    num_positions += 1
+
+                moves = generate_moves(board, player_unit)
+                if not moves:
+                    break
+
+                # favour sumitos so that playouts reach ejections
+                enemy_unit = BoardCellState.next(player_unit)
+                pushes = [m for m in moves if board.get_index(MOVE_TARGET_CELLS[m]) == enemy_unit]
+                apply_move(board, rng.choice(pushes if pushes and rng.random() < 0.8 else moves))
+                player_unit = enemy_unit
+    return num_positions, num_moves
+
+if __name__ == "__main__":
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    num_positions, num_moves = check_playouts(num_games, seed)
+    print(f"checked {num_moves} moves across {num_positions} positions")
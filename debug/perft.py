@@ -0,0 +1,136 @@
+"""
+Counts the leaf positions reachable in exactly `depth` plies (perft), as a
+correctness oracle and throughput benchmark for move generation and
+`apply_move`/`undo_move`. Move sequences are counted whether or not the
+game has been decided along the way.
+
+Divide mode breaks the count down by root move, so that a wrong total can
+be narrowed down to a move. The hash table shortcut reuses the counts of
+transposed subtrees, which makes deep counts much cheaper but no longer
+exercises every node. With more than one worker, root moves are counted in
+a process pool.
+
+Usage: python -m debug.perft depth [--layout NAME | --position POSITION]
+    [--divide] [--hash] [--workers N]
+where POSITION is an `.input` file or its contents, e.g. "b A1b,I5w".
+"""
+
+import os
+from argparse import ArgumentParser
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.board_hasher import hash_board, update_hash_from_record
+from core.game import apply_move, undo_move
+from core.notation import parse_position
+from core.packed_move import unpack_move
+from core.agent.state_generator import generate_moves
+
+
+def perft(board, color, depth, table=None, board_hash=None):
+    """
+    Counts the leaf positions `depth` plies below the given position.
+    If a dict is given as `table`, counts are cached in it by position hash
+    and depth.
+    """
+    if depth == 0:
+        return 1
+
+    if table is not None:
+        if board_hash is None:
+            board_hash = hash_board(board, color)
+        num_leaves = table.get((board_hash, depth))
+        if num_leaves is not None:
+            return num_leaves
+
+    moves = generate_moves(board, color)
+    if depth == 1:
+        num_leaves = len(moves)
+    else:
+        num_leaves = 0
+        enemy_unit = BoardCellState.next(color)
+        for move in moves:
+            move_record = apply_move(board, move)
+            move_hash = (update_hash_from_record(board_hash, board, move_record)
+                if table is not None
+                else None)
+            num_leaves += perft(board, enemy_unit, depth - 1, table, move_hash)
+            undo_move(board, move_record)
+
+    if table is not None:
+        table[(board_hash, depth)] = num_leaves
+    return num_leaves
+
+def _perft_move(board, color, move, depth, use_table):
+    apply_move(board, move)
+    return perft(board, BoardCellState.next(color), depth - 1, {} if use_table else None)
+
+def divide(board, color, depth, use_table=False, executor=None):
+    """
+    Counts the leaf positions below each root move, across the given
+    executor if any.
+    Returns a list of packed moves and their counts.
+    """
+    moves = generate_moves(board, color)
+    if executor:
+        counts = executor.map(_perft_move,
+            [board] * len(moves),
+            [color] * len(moves),
+            moves,
+            [depth] * len(moves),
+            [use_table] * len(moves))
+    else:
+        table = {} if use_table else None
+        counts = []
+        for move in moves:
+            move_record = apply_move(board, move)
+            counts.append(perft(board, BoardCellState.next(color), depth - 1, table))
+            undo_move(board, move_record)
+    return list(zip(moves, counts))
+
+def main():
+    parser = ArgumentParser(description="Counts leaf positions to a fixed depth.")
+    parser.add_argument("depth", type=int)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--layout", choices=[layout.name for layout in BoardLayout], default=BoardLayout.STANDARD.name)
+    source.add_argument("--position", help="an .input file or its contents")
+    parser.add_argument("--divide", action="store_true", help="list the count below each root move")
+    parser.add_argument("--hash", action="store_true", help="reuse the counts of transposed subtrees")
+    parser.add_argument("--workers", type=int, default=1, help="count root moves in a process pool")
+    args = parser.parse_args()
+
+    if args.position:
+        buffer = args.position
+        if os.path.isfile(args.position):
+            with open(args.position, mode="r") as file:
+                buffer = file.read()
+        board, color = parse_position(buffer)
+    else:
+        board, color = BoardLayout.setup_board(BoardLayout[args.layout]), BoardCellState.BLACK
+    board = BitBoard.from_board(board)
+
+    time_start = time()
+    if args.depth < 1 or (args.workers <= 1 and not args.divide):
+        num_leaves = perft(board, color, args.depth, {} if args.hash else None)
+    else:
+        executor = (ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"))
+            if args.workers > 1
+            else None)
+        try:
+            counts = divide(board, color, args.depth, args.hash, executor)
+        finally:
+            executor and executor.shutdown()
+        if args.divide:
+            for move, count in counts:
+                print(f"{unpack_move(move)}: {count}")
+        num_leaves = sum(count for _, count in counts)
+    secs = time() - time_start
+
+    print(f"perft({args.depth}) = {num_leaves} in {secs:.2f}s"
+        f" ({num_leaves / max(secs, 1e-9):.0f} nodes/sec)")
+
+if __name__ == "__main__":
+    main()
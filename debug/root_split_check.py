@@ -0,0 +1,94 @@
+"""
+Checks that the root-splitting search returns the same best move and score
+as the serial fixed-depth search, and reports the speedup.
+
+Positions are the starting layouts plus midgame positions reached by
+seeded random playouts. With the root split's default `EXACT_OPTIONS`, the
+split must match the serial search exactly. With window-dependent pruning
+turned on, its score must be within `SCORE_TOLERANCE` of the serial score.
+
+Usage: python -m debug.root_split_check [depth] [max_workers] [num_midgame_positions]
+"""
+
+import sys
+from random import Random
+from time import time
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.bitboard import BitBoard
+from core.game import apply_move
+from core.agent import Agent
+from core.agent.root_split import EXACT_OPTIONS, create_executor, search_root_split
+from core.agent.state_generator import generate_moves
+from core.packed_move import unpack_move
+
+LAYOUTS = (BoardLayout.STANDARD, BoardLayout.GERMAN_DAISY, BoardLayout.BELGIAN_DAISY)
+MIDGAME_PLIES = (10, 40)
+SEED = 0
+
+PRUNING_OPTIONS = {
+    "null_move_pruning": True,
+    "late_move_reductions": True,
+    "delta_pruning": True,
+}
+SCORE_TOLERANCE = 5
+
+
+def find_positions(num_midgame_positions):
+    positions = [(layout.name, BoardLayout.setup_board(layout), BoardCellState.BLACK) for layout in LAYOUTS]
+    rng = Random(SEED)
+    for i in range(num_midgame_positions):
+        layout = LAYOUTS[i % len(LAYOUTS)]
+        board = BitBoard.from_board(BoardLayout.setup_board(layout))
+        color = BoardCellState.BLACK
+        for _ in range(rng.randint(*MIDGAME_PLIES)):
+            moves = generate_moves(board, color)
+            if not moves:
+                break
+            apply_move(board, rng.choice(moves))
+            color = BoardCellState.next(color)
+        positions.append((f"{layout.name} midgame {i}", board, color))
+    return positions
+
+def check_position(name, board, color, depth, executor, agent_options, exact):
+    time_start = time()
+    agent_options = {**EXACT_OPTIONS, **agent_options}
+    serial_move, serial_score = Agent(num_helpers=0, opening_book_path=None, **agent_options).search_depth(board, color, depth)
+    serial_secs = time() - time_start
+
+    time_start = time()
+    split_move, split_score = search_root_split(board, color, depth, executor,
+        agent=Agent(num_helpers=0, opening_book_path=None, **agent_options))
+    split_secs = time() - time_start
+
+    matches = ((split_move, split_score) == (serial_move, serial_score)
+        if exact
+        else abs(split_score - serial_score) <= SCORE_TOLERANCE)
+    if not matches:
+        raise AssertionError(f"{name} at depth {depth} ({'exact' if exact else 'pruning'} options):"
+            f" serial {unpack_move(serial_move)} ({serial_score}),"
+            f" split {unpack_move(split_move)} ({split_score}) on {board}")
+    return serial_move == split_move, serial_secs, split_secs
+
+def check_positions(positions, depth, max_workers, agent_options, exact):
+    num_same_moves = 0
+    total_serial_secs = total_split_secs = 0
+    with create_executor(max_workers, opening_book_path=None, **agent_options) as executor:
+        # warm the workers up so that process startup is not timed
+        executor.submit(print, end="").result()
+        for name, board, color in positions:
+            same_move, serial_secs, split_secs = check_position(name, board, color, depth,
+                executor, agent_options, exact)
+            num_same_moves += same_move
+            total_serial_secs += serial_secs
+            total_split_secs += split_secs
+    print(f"{'exact' if exact else 'pruning'} options: {num_same_moves}/{len(positions)} same moves,"
+        f" serial {total_serial_secs:.2f}s, split {total_split_secs:.2f}s")
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    num_midgame_positions = int(sys.argv[3]) if len(sys.argv) > 3 else 36
+    positions = find_positions(num_midgame_positions)
+    check_positions(positions, depth, max_workers, {}, exact=True)
+    check_positions(positions, depth, max_workers, PRUNING_OPTIONS, exact=False)
@@ -0,0 +1,83 @@
+import json
+from argparse import ArgumentParser
+from dataclasses import asdict
+from time import time
+from core.app_config import AppConfig
+from core.arena import ArenaPlayer, run_arena
+from core.board_layout import BoardLayout
+
+def parse_switch(value):
+    return value.lower() in ("1", "on", "true", "yes")
+
+def parse_book(value):
+    return None if value.lower() == "none" else value
+
+def main():
+    app_config = AppConfig()
+    parser = ArgumentParser(description="Plays headless games between two agent configurations."
+        " Options taking two values give the settings of the first and second configuration.")
+    parser.add_argument("output", help="file to write one JSON line per game to")
+    parser.add_argument("--games", type=int, default=2)
+    parser.add_argument("--layouts", nargs="+", choices=[layout.name for layout in BoardLayout],
+        default=[app_config.starting_layout.name])
+    parser.add_argument("--depths", type=int, nargs=2, default=None,
+        help="search to a fixed depth instead of under the time limits")
+    parser.add_argument("--time-limits", type=float, nargs=2, default=app_config.time_limits)
+    parser.add_argument("--move-limits", type=int, nargs=2, default=app_config.move_limits)
+    parser.add_argument("--null-move-pruning", type=parse_switch, nargs=2, default=(True, True))
+    parser.add_argument("--late-move-reductions", type=parse_switch, nargs=2, default=(True, True))
+    parser.add_argument("--delta-pruning", type=parse_switch, nargs=2, default=(True, True))
+    parser.add_argument("--books", type=parse_book, nargs=2, default=None,
+        help="opening book paths, or none")
+    parser.add_argument("--random-plies", type=int, default=2,
+        help="random moves opening each pair of games")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    players = tuple(ArenaPlayer(
+        depth=args.depths[i] if args.depths else None,
+        time_limit=args.time_limits[i],
+        move_limit=args.move_limits[i],
+        null_move_pruning=args.null_move_pruning[i],
+        late_move_reductions=args.late_move_reductions[i],
+        delta_pruning=args.delta_pruning[i],
+        **({"opening_book_path": args.books[i]} if args.books else {}),
+    ) for i in range(2))
+    for i, player in enumerate(players):
+        print(f"player {i}: {player}")
+
+    time_start = time()
+    num_games = 0
+    num_wins = [0, 0]
+    num_draws = 0
+    num_nodes = 0
+    search_secs = 0
+    with open(args.output, mode="w") as file:
+        for num_games, result in enumerate(run_arena(players,
+                layouts=[BoardLayout[name] for name in args.layouts],
+                num_games=args.games,
+                num_random_plies=args.random_plies,
+                seed=args.seed,
+                max_workers=args.workers), start=1):
+            file.write(json.dumps(asdict(result)) + "\n")
+            file.flush()
+
+            if result.winner is None:
+                num_draws += 1
+            else:
+                num_wins[result.winner] += 1
+            num_nodes += result.num_nodes
+            search_secs += result.search_secs
+            winner = f"player {result.winner}" if result.winner is not None else "draw"
+            print(f"game {result.index} ({result.layout}, player {result.players[0]} black):"
+                f" {winner} after {result.num_plies} plies in {result.secs:.1f}s"
+                f" [{num_wins[0]}-{num_wins[1]}-{num_draws}]")
+
+    secs = time() - time_start
+    print(f"player 0: {num_wins[0]} wins, player 1: {num_wins[1]} wins, {num_draws} draws")
+    print(f"{num_games / secs * 3600:.1f} games/hour,"
+        f" {num_nodes / max(search_secs, 1e-9):.0f} nodes/sec per worker")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from argparse import ArgumentParser
+from collections import Counter
+from core.board_cell_state import BoardCellState
+from core.board_layout import BoardLayout
+from core.board_hasher import hash_board
+from core.packed_move import unpack_move
+from core.agent.opening_book import (
+    BOOK_LAYOUTS, build_book, read_book, write_book, merge_books, prune_book,
+)
+
+
+def build(args):
+    book = build_book(args.plies, args.depth, max_workers=args.workers,
+        on_progress=lambda i, n: print(f"\rsearched {i}/{n} positions", end="", flush=True))
+    print()
+    write_book(args.output, book)
+    print(f"wrote {len(book)} entries to {args.output}")
+
+def merge(args):
+    book = merge_books(read_book(path) for path in args.inputs)
+    write_book(args.output, book)
+    print(f"wrote {len(book)} entries to {args.output}")
+
+def prune(args):
+    book = read_book(args.input)
+    pruned_book = prune_book(book, min_depth=args.min_depth, max_plies=args.max_plies)
+    write_book(args.output, pruned_book)
+    print(f"kept {len(pruned_book)} of {len(book)} entries in {args.output}")
+
+def inspect(args):
+    book = read_book(args.input)
+    print(f"{len(book)} entries")
+    for depth, num_entries in sorted(Counter(e.depth for e in book.values()).items()):
+        print(f"  depth {depth}: {num_entries}")
+
+    for layout in BOOK_LAYOUTS:
+        board_hash = hash_board(BoardLayout.setup_board(layout), BoardCellState.BLACK)
+        entry = book.get(board_hash)
+        print(f"{layout.name}: " + (f"{unpack_move(entry.move)} ({entry.score:.2f})" if entry else "not in book"))
+
+    if args.entries:
+        for key, entry in sorted(book.items()):
+            print(f"{key:016x} {unpack_move(entry.move)} {entry.score:.2f} depth {entry.depth}")
+
+def main():
+    parser = ArgumentParser(description="Builds and maintains opening books.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="search the first plies of the built-in layouts")
+    build_parser.add_argument("output")
+    build_parser.add_argument("--plies", type=int, default=2)
+    build_parser.add_argument("--depth", type=int, default=5)
+    build_parser.add_argument("--workers", type=int, default=None)
+    build_parser.set_defaults(run=build)
+
+    merge_parser = commands.add_parser("merge", help="merge books, keeping the deepest entries")
+    merge_parser.add_argument("output")
+    merge_parser.add_argument("inputs", nargs="+")
+    merge_parser.set_defaults(run=merge)
+
+    prune_parser = commands.add_parser("prune", help="drop shallow or unreachable entries")
+    prune_parser.add_argument("output")
+    prune_parser.add_argument("input")
+    prune_parser.add_argument("--min-depth", type=int, default=0)
+    prune_parser.add_argument("--max-plies", type=int, default=None)
+    prune_parser.set_defaults(run=prune)
+
+    inspect_parser = commands.add_parser("inspect", help="summarize a book")
+    inspect_parser.add_argument("input")
+    inspect_parser.add_argument("--entries", action="store_true", help="list every entry")
+    inspect_parser.set_defaults(run=inspect)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
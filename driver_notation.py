@@ -1,22 +1,16 @@
+import os
 import sys
+from argparse import ArgumentParser
+from glob import glob
 from os.path import splitext
-from copy import deepcopy
-from core.board_cell_state import BoardCellState
-from core.board import Board
-from core.board_layout import BoardLayout
-from core.hex import Hex
-from core.agent import Agent
-from core.game import apply_move
-
-MAP_COLOR = {
-  "b": BoardCellState.BLACK,
-  "w": BoardCellState.WHITE,
-}
-
-def convert_cell_to_hex(cell):
-    col = int(cell[1]) - 1
-    row = 9 - (ord(cell[0]) - 65) - 1
-    return Hex(col, row)
+from time import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from core.bitboard import BitBoard
+from core.notation import NotationError, parse_position
+from core.packed_move import unpack_move
+from core.agent.state_generator import generate_moves
+from core.game import apply_move, undo_move
 
 def read_buffer(file_name):
     file_buffer = None
@@ -24,43 +18,80 @@ def read_buffer(file_name):
         file_buffer = file.read()
     return file_buffer
 
-def write_moves(file_name, moves):
-    file_buffer = "\n".join([str(move) for move in moves]) + "\n"
-    with open(file_name, mode="w", encoding="utf-8") as file:
-        file.write(file_buffer)
+def find_input_files(paths):
+    """
+    Expands directories to the `.input` files they contain and globs to the
+    files they match, keeping the given order and dropping duplicates.
+    """
+    file_names = []
+    for path in paths:
+        if os.path.isdir(path):
+            file_names += sorted(glob(os.path.join(path, "*.input")))
+        elif any(c in path for c in "*?["):
+            file_names += sorted(glob(path))
+        else:
+            file_names.append(path)
+    return list(dict.fromkeys(file_names))
+
+def process_file(file_name):
+    """
+    Writes the legal moves of the position in the given `.input` file to a
+    `.move` file and the boards they lead to to a `.board` file, one line
+    per move, as each move is applied.
+    Returns the number of moves and the seconds taken.
+    """
+    time_start = time()
+    board, turn = parse_position(read_buffer(file_name))
+    board = BitBoard.from_board(board)
+    moves = generate_moves(board, turn)
+
+    file_base = splitext(file_name)[0]
+    with open(f"{file_base}.move", mode="w", encoding="utf-8") as move_file, \
+            open(f"{file_base}.board", mode="w", encoding="utf-8") as board_file:
+        for move in moves:
+            move_file.write(f"{unpack_move(move)}\n")
+            move_record = apply_move(board, move)
+            board_file.write(f"{board}\n")
+            undo_move(board, move_record)
 
-def write_boards(file_name, boards):
-    file_buffer = "\n".join([str(board) for board in boards]) + "\n"
-    with open(file_name, mode="w", encoding="utf-8") as file:
-        file.write(file_buffer)
+    return len(moves), time() - time_start
 
 def main():
-    # file_name = sys.argv[1]
-    # file_base = splitext(file_name)[0]
-    # file_buffer = read_buffer(file_name)
+    parser = ArgumentParser(description="Lists the legal moves and resulting boards of .input positions.")
+    parser.add_argument("inputs", nargs="+", help=".input files, directories of them, or globs")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size; 1 runs in process")
+    args = parser.parse_args()
 
-    # turn_line, pieces_line, _ = file_buffer.split("\n")
-    # turn = MAP_COLOR[turn_line]
+    file_names = find_input_files(args.inputs)
+    if not file_names:
+        print("no input files found", file=sys.stderr)
+        sys.exit(1)
 
-    # pieces = []
-    # piece_strs = pieces_line.split(",")
-    # for piece_str in piece_strs:
-    #     piece_cell = convert_cell_to_hex(piece_str[0:2])
-    #     piece_color = MAP_COLOR[piece_str[-1]]
-    #     pieces.append((piece_cell, piece_color))
+    time_start = time()
+    num_errors = 0
 
-    file_base = "TestStandard"
-    board = BoardLayout.setup_board(BoardLayout.STANDARD)
-    turn = BoardCellState.BLACK
-    # board.fill(BoardCellState.EMPTY)
-    # for piece_cell, piece_color in pieces:
-        # board[piece_cell] = piece_color
+    def report(file_name, result):
+        nonlocal num_errors
+        try:
+            num_moves, secs = result()
+        except (NotationError, OSError) as e:
+            num_errors += 1
+            print(f"{file_name}: {e}", file=sys.stderr)
+        else:
+            print(f"{file_name}: {num_moves} moves in {secs * 1000:.1f}ms")
 
-    moves = Agent()._enumerate_player_moves(board, turn)
-    write_moves(f"{file_base}.move", moves)
+    if args.workers == 1:
+        for file_name in file_names:
+            report(file_name, lambda: process_file(file_name))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) as executor:
+            futures = {executor.submit(process_file, file_name): file_name for file_name in file_names}
+            for future in as_completed(futures):
+                report(futures[future], future.result)
 
-    boards = [apply_move(deepcopy(board), move) for move in moves]
-    write_boards(f"{file_base}.board", boards)
+    print(f"processed {len(file_names) - num_errors} of {len(file_names)} files"
+        f" in {time() - time_start:.2f}s")
+    num_errors and sys.exit(1)
 
 if __name__ == "__main__":
     main()